@@ -2,38 +2,53 @@
 Application configuration settings.
 Loads environment variables for Supabase, Weaviate, and SEC API.
 """
-from pydantic_settings import BaseSettings
+from functools import lru_cache
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import Optional
 
 
 class Settings(BaseSettings):
     """Application settings loaded from environment variables."""
     
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        case_sensitive=False,
+        frozen=True
+    )
+    
     # Supabase Configuration
     supabase_url: str
     supabase_key: str
     database_url: str
     
+    # Database connection pool
+    db_pool_size: int = 20
+    db_max_overflow: int = 40
+    db_pool_recycle: int = 1800  # Seconds before a connection is replaced
+    
     # Weaviate Configuration
     weaviate_url: str = "http://localhost:8080"
     weaviate_api_key: Optional[str] = None
     
     # Gemini Configuration (for both RAG and Weaviate embeddings)
     gemini_api_key: str = ""
+    # Answers are only generated when the best chunk scores at least this
+    answer_min_score: float = 0.8
     
     # SEC API Configuration
     sec_api_user_agent: str = "RegulatoryExplorer/1.0"
     sec_api_email: str = "contact@example.com"
     
+    # Development profiling (requires pyinstrument from the dev dependency group)
+    profiling_enabled: bool = False
+    
     # Pagination defaults
     default_page_size: int = 20
     max_page_size: int = 100
-    
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
 
 
-# Global settings instance
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Load settings once per process and return the cached instance."""
+    return Settings()
 
@@ -1,14 +1,22 @@
 """
 Database connection and session management for Supabase PostgreSQL.
 """
-from sqlalchemy import create_engine
+import logging
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from .config import settings
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
 
 # Create SQLAlchemy engine
 engine = create_engine(
     settings.database_url,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_recycle=settings.db_pool_recycle,
     pool_pre_ping=True,  # Verify connections before using
     echo=False  # Set to True for SQL query logging during development
 )
@@ -32,11 +40,43 @@ def get_db():
         db.close()
 
 
+def _enable_pg_trgm() -> bool:
+    """Create the pg_trgm extension if possible and report whether it is available."""
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        return True
+    except DBAPIError as e:
+        # The extension may already be installed by someone with more privileges
+        with engine.connect() as conn:
+            installed = conn.execute(
+                text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            ).scalar() is not None
+        if not installed:
+            logger.warning(f"pg_trgm extension unavailable, skipping trigram indexes: {e}")
+        return installed
+
+
 def init_db():
     """
     Initialize database tables.
     Creates all tables defined in models.
     """
     from . import models  # Import here to avoid circular imports
+    
+    # Trigram indexes on documents need pg_trgm. They only speed up ILIKE
+    # filters, so without it (e.g. a role lacking extension privileges)
+    # skip them rather than failing startup.
+    if not _enable_pg_trgm():
+        table = models.Document.__table__
+        for index in list(table.indexes):
+            if "gin_trgm_ops" in index.dialect_options["postgresql"]["ops"].values():
+                table.indexes.discard(index)
+    
     Base.metadata.create_all(bind=engine)
+    
+    # create_all skips indexes on tables that already exist,
+    # so make sure indexes added later are created as well
+    for index in models.Document.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
 
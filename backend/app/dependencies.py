@@ -0,0 +1,40 @@
+"""
+FastAPI dependencies for shared application services.
+Services are created once in the app lifespan and stored on app.state.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from uuid import UUID
+from fastapi import Request
+
+from .schemas import SyncJob
+from .services.weaviate_service import WeaviateService
+from .services.gemini_service import GeminiService
+from .services.sec_service import SECService
+from .services.chunking_service import ChunkingService
+from .services.document_service import DocumentService
+from .services.search_service import SearchService
+
+
+@dataclass
+class Services:
+    """Service instances shared across requests."""
+    weaviate: WeaviateService
+    gemini: GeminiService
+    sec: SECService
+    chunking: ChunkingService
+    documents: DocumentService
+    search: SearchService
+    
+    # Process pool for CPU-bound document chunking during syncs
+    chunking_pool: ProcessPoolExecutor
+    chunking_workers: int
+    
+    # Background sync jobs by ID (in-memory, per process); finished jobs
+    # are evicted after SYNC_JOB_TTL when a new job starts
+    sync_jobs: dict[UUID, SyncJob] = field(default_factory=dict)
+
+
+def get_services(request: Request) -> Services:
+    """Dependency returning the application's shared services."""
+    return request.app.state.services
@@ -2,9 +2,14 @@
 Main FastAPI application.
 Entry point for the SEC Edgar regulatory document explorer API.
 """
+import asyncio
 import logging
-from fastapi import FastAPI
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import HTMLResponse
 from contextlib import asynccontextmanager
 
 # Configure logging
@@ -14,8 +19,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+from .config import get_settings
 from .database import init_db, get_db
+from .dependencies import Services
 from .routers import documents, search
+from .responses import ORJSONResponse
 from .services.weaviate_service import WeaviateService
 from .services.gemini_service import GeminiService
 from .services.sec_service import SECService
@@ -23,28 +31,14 @@ from .services.chunking_service import ChunkingService
 from .services.document_service import DocumentService
 from .services.search_service import SearchService
 
-# Initialize service instances at app startup
-weaviate_service = WeaviateService()
-gemini_service = GeminiService()
-sec_service = SECService()
-chunking_service = ChunkingService()
-document_service = DocumentService()
-search_service = SearchService(weaviate_service)
+# Liveness probe (Docker HEALTHCHECK) and the dependency health endpoint
+HEALTH_CHECK_PATHS = {"/", "/api/health"}
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """
-    Lifecycle manager for FastAPI application.
-    Handles startup and shutdown events.
-    """
-    # Startup
-    logger.info("Starting up...")
-    
-    # Initialize database
+def _init_database(document_service: DocumentService):
+    """Create tables and seed filing types."""
     init_db()
     
-    # Initialize filing types
     db = next(get_db())
     try:
         document_service.initialize_filing_types(db)
@@ -53,8 +47,11 @@ async def lifespan(app: FastAPI):
         logger.error(f"Error initializing filing types: {e}")
     finally:
         db.close()
-    
-    # Initialize Weaviate schema
+
+
+def _init_weaviate() -> WeaviateService:
+    """Connect to Weaviate and create the collection if needed."""
+    weaviate_service = WeaviateService()
     try:
         if weaviate_service.is_connected():
             weaviate_service.create_schema()
@@ -63,12 +60,52 @@ async def lifespan(app: FastAPI):
             logger.warning("Warning: Weaviate is not connected")
     except Exception as e:
         logger.error(f"Error initializing Weaviate: {e}")
+    return weaviate_service
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Lifecycle manager for FastAPI application.
+    Handles startup and shutdown events.
+    """
+    # Startup
+    logger.info("Starting up...")
+    
+    # Database and Weaviate setup are independent network work,
+    # so run them concurrently off the event loop
+    document_service = DocumentService()
+    weaviate_service, _ = await asyncio.gather(
+        asyncio.to_thread(_init_weaviate),
+        asyncio.to_thread(_init_database, document_service)
+    )
+    
+    # Initialize service instances, shared with routes via app.state
+    chunking_workers = os.cpu_count() or 1
+    gemini_service = GeminiService()
+    app.state.services = services = Services(
+        weaviate=weaviate_service,
+        gemini=gemini_service,
+        sec=SECService(),
+        chunking=ChunkingService(),
+        documents=document_service,
+        search=SearchService(weaviate_service, gemini_service),
+        # Workers start from a forkserver: forking this process once Weaviate's
+        # gRPC threads and to_thread workers are running can deadlock
+        chunking_pool=ProcessPoolExecutor(
+            max_workers=chunking_workers,
+            mp_context=multiprocessing.get_context("forkserver")
+        ),
+        chunking_workers=chunking_workers,
+    )
     
     yield
     
     # Shutdown
     logger.info("Shutting down...")
-    weaviate_service.close()
+    services.weaviate.close()
+    await services.sec.aclose()
+    services.chunking_pool.shutdown(cancel_futures=True)
 
 
 # Create FastAPI application
@@ -76,7 +113,8 @@ app = FastAPI(
     title="SEC Edgar Regulatory Document Explorer",
     description="API for exploring SEC regulatory filings with RAG-ready architecture",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -84,10 +122,37 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173", "http://localhost:3000"],  # Vite and CRA defaults
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type"],
 )
 
+# Per-request profiling for development, enabled with PROFILING_ENABLED=true.
+# pyinstrument is only in the dev dependency group, so a production image
+# logs a warning and runs without profiling instead of failing to start.
+Profiler = None
+if get_settings().profiling_enabled:
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        logger.warning(
+            "PROFILING_ENABLED is set but pyinstrument is not installed "
+            "(install the dev dependency group); profiling is disabled"
+        )
+
+if Profiler is not None:
+    @app.middleware("http")
+    async def profile_request(request: Request, call_next):
+        """Return a pyinstrument flame graph instead of the response when ?profile=1 is passed."""
+        # Health checks are polled constantly, so they go straight through
+        if request.scope["path"] in HEALTH_CHECK_PATHS or not request.query_params.get("profile"):
+            return await call_next(request)
+        
+        profiler = Profiler(async_mode="enabled")
+        profiler.start()
+        await call_next(request)
+        profiler.stop()
+        return HTMLResponse(profiler.output_html())
+
 # Include routers
 app.include_router(documents.router)
 app.include_router(search.router)
@@ -2,8 +2,9 @@
 SQLAlchemy models for Supabase PostgreSQL database.
 Defines document and filing type tables.
 """
-from sqlalchemy import Column, String, Text, Boolean, Integer, Date, DateTime, func
+from sqlalchemy import Column, String, Text, Boolean, Integer, Date, DateTime, Index, func
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import deferred
 import uuid
 from .database import Base
 
@@ -23,12 +24,38 @@ class Document(Base):
     filing_date = Column(Date, nullable=False, index=True)
     description = Column(Text)
     document_url = Column(String(512), nullable=False)
-    markdown_content = Column(Text)
+    # Full filing text can be several MB; only loaded when explicitly requested
+    markdown_content = deferred(Column(Text))
     is_chunked = Column(Boolean, default=False, nullable=False)
     chunk_count = Column(Integer, default=0, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
+    __table_args__ = (
+        # Backs keyset pagination on (filing_date DESC, id DESC)
+        Index("ix_documents_filing_date_id", filing_date.desc(), id.desc()),
+        # Trigram indexes let ILIKE '%term%' filters use bitmap index scans
+        # (requires the pg_trgm extension, enabled in init_db)
+        Index(
+            "ix_documents_company_name_trgm",
+            company_name,
+            postgresql_using="gin",
+            postgresql_ops={"company_name": "gin_trgm_ops"}
+        ),
+        Index(
+            "ix_documents_description_trgm",
+            description,
+            postgresql_using="gin",
+            postgresql_ops={"description": "gin_trgm_ops"}
+        ),
+        Index(
+            "ix_documents_filing_type_trgm",
+            filing_type,
+            postgresql_using="gin",
+            postgresql_ops={"filing_type": "gin_trgm_ops"}
+        ),
+    )
+
     def __repr__(self):
         return f"<Document {self.company_name} - {self.filing_type} ({self.filing_date})>"
 
@@ -0,0 +1,20 @@
+"""
+Custom response classes.
+Uses orjson for fast JSON rendering across the API.
+"""
+import orjson
+from fastapi.responses import ORJSONResponse as BaseORJSONResponse
+
+
+class ORJSONResponse(BaseORJSONResponse):
+    """
+    ORJSONResponse that also handles types orjson can't natively serialize.
+    Naive datetimes are treated as UTC; anything else unknown falls back to str().
+    """
+    
+    def render(self, content) -> bytes:
+        return orjson.dumps(
+            content,
+            default=str,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY
+        )
@@ -2,106 +2,160 @@
 API routes for document management.
 Handles listing, retrieving, and syncing SEC documents.
 """
+import asyncio
 import logging
-from fastapi import APIRouter, Depends, HTTPException, Query
+import time
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 from typing import Optional
-from datetime import date, datetime, timezone
-from uuid import UUID
+from datetime import date, datetime, timedelta, timezone
+from uuid import UUID, uuid4
 
-from ..database import get_db
+from ..config import get_settings
+from ..database import SessionLocal, get_db
 from ..schemas import (
     Document,
-    DocumentWithText,
     DocumentList,
-    DocumentUpdate,
     FilingType,
     SyncRequest,
     SyncResponse,
+    SyncJob,
     ChunkStatus,
-    HealthCheck
+    HealthCheck,
+    DOCUMENT_LIST_ADAPTER
 )
 from ..schemas import DocumentCreate
-from .. import main
+from ..services.chunking_service import ChunkingService
+from ..dependencies import Services, get_services
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api", tags=["documents"])
 
+# How long a health check result is reused, in seconds
+HEALTH_CACHE_TTL = 5.0
+_health_cache: Optional[tuple[float, HealthCheck]] = None
+
+# How long a finished sync job stays available for polling
+SYNC_JOB_TTL = timedelta(hours=1)
+
+
+def _check_supabase() -> bool:
+    """Test the Supabase connection with its own short-lived session."""
+    db = SessionLocal()
+    try:
+        db.execute(text("SELECT 1"))
+        return True
+    except:
+        return False
+    finally:
+        db.close()
+
+
+def _check_weaviate(services: Services) -> bool:
+    """Test the Weaviate connection."""
+    try:
+        return services.weaviate.is_connected()
+    except:
+        return False
+
 
 @router.get("/health", response_model=HealthCheck)
-async def health_check(db: Session = Depends(get_db)):
+async def health_check(services: Services = Depends(get_services)):
     """
     Health check endpoint.
     Verifies API, Supabase, and Weaviate connectivity.
+    Results are cached for a few seconds so frequent probes don't hit
+    the database and Weaviate every time.
     """
-    supabase_connected = False
-    weaviate_connected = False
+    global _health_cache
     
-    try:
-        # Test Supabase connection
-        db.execute("SELECT 1")
-        supabase_connected = True
-    except:
-        pass
+    now = time.monotonic()
+    if _health_cache and now - _health_cache[0] < HEALTH_CACHE_TTL:
+        return _health_cache[1]
     
-    try:
-        # Test Weaviate connection
-        weaviate_connected = main.weaviate_service.is_connected()
-    except:
-        pass
+    # Run both probes concurrently, off the event loop
+    supabase_connected, weaviate_connected = await asyncio.gather(
+        asyncio.to_thread(_check_supabase),
+        asyncio.to_thread(_check_weaviate, services)
+    )
     
     status = "healthy" if (supabase_connected and weaviate_connected) else "degraded"
     
-    return HealthCheck(
+    health = HealthCheck(
         status=status,
         supabase_connected=supabase_connected,
         weaviate_connected=weaviate_connected,
         timestamp=datetime.now(timezone.utc)
     )
+    _health_cache = (now, health)
+    
+    return health
 
 
 @router.get("/documents", response_model=DocumentList)
 async def list_documents(
-    skip: int = Query(0, ge=0, description="Number of records to skip"),
+    skip: int = Query(0, ge=0, description="Number of records to skip (ignored when cursor is set)"),
     limit: int = Query(20, ge=1, le=100, description="Number of records to return"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
+    include_total: bool = Query(False, description="Include the total count"),
+    estimate_total: bool = Query(False, description="Use the planner's row estimate for unfiltered totals"),
     filing_type: Optional[str] = Query(None, description="Filter by filing type"),
     company_name: Optional[str] = Query(None, description="Filter by company name"),
     start_date: Optional[date] = Query(None, description="Filter by start date"),
     end_date: Optional[date] = Query(None, description="Filter by end date"),
     search: Optional[str] = Query(None, description="Search across company name and description"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    services: Services = Depends(get_services)
 ):
     """
     List documents with optional filtering and pagination.
+    Pass the returned next_cursor back as cursor to fetch the following page.
     """
-    documents, total = main.document_service.list_documents(
-        db=db,
-        skip=skip,
-        limit=limit,
-        filing_type=filing_type,
-        company_name=company_name,
-        start_date=start_date,
-        end_date=end_date,
-        search=search
-    )
+    try:
+        documents, total, next_cursor = services.documents.list_documents(
+            db=db,
+            skip=skip,
+            limit=limit,
+            filing_type=filing_type,
+            company_name=company_name,
+            start_date=start_date,
+            end_date=end_date,
+            search=search,
+            cursor=cursor,
+            include_total=include_total,
+            estimate_total=estimate_total
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    return DocumentList(
+    # Serialize straight to JSON bytes, skipping FastAPI's response_model
+    # re-validation and jsonable_encoder pass
+    document_list = DocumentList(
         items=documents,
         total=total,
         skip=skip,
-        limit=limit
+        limit=limit,
+        next_cursor=next_cursor
+    )
+    return Response(
+        content=DOCUMENT_LIST_ADAPTER.dump_json(document_list),
+        media_type="application/json"
     )
 
 
-@router.get("/documents/{document_id}", response_model=DocumentWithText)
+@router.get("/documents/{document_id}", response_model=Document)
 async def get_document(
     document_id: UUID,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    services: Services = Depends(get_services)
 ):
     """
-    Get a single document by ID, including full text.
+    Get a single document by ID.
+    The full text is served separately by GET /documents/{document_id}/content.
     """
-    document = main.document_service.get_document_by_id(db, document_id)
+    document = services.documents.get_document(db, document_id)
     
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
@@ -109,15 +163,45 @@ async def get_document(
     return document
 
 
+def _stream_markdown_content(services: Services, document_id: UUID):
+    """Stream a document's markdown content using its own session."""
+    db = SessionLocal()
+    try:
+        yield from services.documents.iter_markdown_content(db, document_id)
+    finally:
+        db.close()
+
+
+@router.get("/documents/{document_id}/content")
+async def get_document_content(
+    document_id: UUID,
+    db: Session = Depends(get_db),
+    services: Services = Depends(get_services)
+):
+    """
+    Stream a document's full markdown content.
+    """
+    document = services.documents.get_document(db, document_id)
+    
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    return StreamingResponse(
+        _stream_markdown_content(services, document_id),
+        media_type="text/markdown"
+    )
+
+
 @router.get("/documents/{document_id}/chunks/status", response_model=ChunkStatus)
 async def get_chunk_status(
     document_id: UUID,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    services: Services = Depends(get_services)
 ):
     """
     Check the chunking status of a document.
     """
-    document = main.document_service.get_document_by_id(db, document_id)
+    document = services.documents.get_document(db, document_id)
     
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
@@ -126,7 +210,7 @@ async def get_chunk_status(
     weaviate_count = None
     if document.is_chunked:
         try:
-            weaviate_count = main.weaviate_service.get_chunk_count(str(document_id))
+            weaviate_count = services.weaviate.get_chunk_count(str(document_id))
         except:
             pass
     
@@ -138,106 +222,248 @@ async def get_chunk_status(
     )
 
 
-@router.post("/documents/sync", response_model=SyncResponse)
-async def sync_documents(
-    request: SyncRequest,
-    db: Session = Depends(get_db)
-):
+def _classify_filings(
+    services: Services,
+    db: Session,
+    filings: list[dict]
+) -> tuple[dict, list[DocumentCreate], int]:
+    """
+    Split fetched filings into new documents and existing ones still needing chunks.
+    
+    Returns:
+        Tuple of (accession number to ID for unchunked existing documents,
+        documents to create, number of filings already stored)
+    """
+    document_ids = {}
+    new_documents = []
+    existing_count = 0
+    
+    # Look up every existing document in one query
+    existing_docs = services.documents.get_documents_by_accessions(
+        db, [filing_data["accession_number"] for filing_data in filings]
+    )
+    
+    for filing_data in filings:
+        existing_doc = existing_docs.get(filing_data["accession_number"])
+        
+        if existing_doc:
+            existing_count += 1
+            # Skip if already chunked
+            if not existing_doc.is_chunked:
+                document_ids[existing_doc.accession_number] = existing_doc.id
+        else:
+            new_documents.append(DocumentCreate(**filing_data))
+    
+    return document_ids, new_documents, existing_count
+
+
+def _chunk_metadata(filing_data: dict, document_id: UUID, created_at: datetime) -> dict:
+    """Build the metadata stored alongside each chunk of a filing."""
+    return {
+        "document_id": document_id,
+        "accession_number": filing_data["accession_number"],
+        "company_name": filing_data["company_name"],
+        "filing_type": filing_data["filing_type"],
+        "filing_date": filing_data["filing_date"],
+        "document_url": filing_data["document_url"],
+        "created_at": created_at
+    }
+
+
+async def _sync_filings(
+    services: Services,
+    db: Session,
+    request: SyncRequest
+) -> SyncResponse:
     """
     Sync SEC filings from Edgar API.
     Fetches documents, stores in Supabase, chunks text, and stores in Weaviate.
     """
-    documents_created = 0
-    documents_updated = 0
     chunks_created = 0
     
-    try:
-        # Ensure Weaviate schema exists
-        if main.weaviate_service.is_connected():
-            main.weaviate_service.create_schema()
+    # Ensure Weaviate schema exists
+    weaviate_connected = await asyncio.to_thread(services.weaviate.is_connected)
+    if weaviate_connected:
+        await asyncio.to_thread(services.weaviate.create_schema)
+    
+    # Fetch filings from SEC
+    filings = await services.sec.sync_companies(
+        ciks=request.ciks,
+        max_filings_per_company=request.max_filings_per_company,
+        fetch_markdown=True
+    )
+    
+    # Split filings into new documents and existing ones still needing chunks
+    document_ids, new_documents, documents_updated = await asyncio.to_thread(
+        _classify_filings, services, db, filings
+    )
+    
+    # Insert all new documents in one statement, committed before any
+    # chunks referencing them reach Weaviate
+    created_ids = await asyncio.to_thread(
+        services.documents.bulk_create_documents, db, new_documents
+    )
+    await asyncio.to_thread(db.commit)
+    documents_created = len(created_ids)
+    document_ids.update(created_ids)
+    logger.info(f"Created {documents_created} documents")
+    
+    # Chunk every pending filing that has markdown content across the process pool
+    all_chunks = []
+    chunk_counts = {}
+    if weaviate_connected:
+        created_at = datetime.now(timezone.utc)
+        payload = [
+            (
+                filing_data["markdown_content"],
+                _chunk_metadata(filing_data, document_ids[filing_data["accession_number"]], created_at)
+            )
+            for filing_data in filings
+            if filing_data["accession_number"] in document_ids
+            and filing_data.get("markdown_content")
+        ]
         
-        # Fetch filings from SEC
-        filings = await main.sec_service.sync_companies(
-            ciks=request.ciks,
-            max_filings_per_company=request.max_filings_per_company,
-            fetch_markdown=True
+        # One batch per worker so filings are chunked on all cores at once
+        workers = min(len(payload), services.chunking_workers)
+        batches = [payload[i::workers] for i in range(workers)]
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *[
+                loop.run_in_executor(services.chunking_pool, ChunkingService.chunk_document_batch, batch)
+                for batch in batches
+            ],
+            return_exceptions=True
         )
         
-        # Process each filing
-        for filing_data in filings:
-            try:
-                # Check if document already exists
-                existing_doc = main.document_service.get_document_by_accession(
-                    db, filing_data["accession_number"]
-                )
-                
-                if existing_doc:
-                    documents_updated += 1
-                    document_id = existing_doc.id
-                    # Skip if already chunked
-                    if existing_doc.is_chunked:
-                        continue
-                else:
-                    # Create new document
-                    doc_create = DocumentCreate(**filing_data)
-                    new_doc = main.document_service.create_document(db, doc_create)
-                    documents_created += 1
-                    document_id = new_doc.id
-                    logger.info(f"Created document: {filing_data['company_name']} - {filing_data['filing_type']}")
-                
-                # Chunk the document if we have markdown content
-                markdown_content = filing_data.get("markdown_content")
-                if markdown_content and main.weaviate_service.is_connected():
-                    logger.info(f"Processing markdown for chunking...")
-                    # Prepare metadata for chunking
-                    metadata = {
-                        "document_id": document_id,
-                        "accession_number": filing_data["accession_number"],
-                        "company_name": filing_data["company_name"],
-                        "filing_type": filing_data["filing_type"],
-                        "filing_date": filing_data["filing_date"],
-                        "document_url": filing_data["document_url"],
-                        "created_at": datetime.now(timezone.utc)
-                    }
-                    
-                    # Chunk the markdown content
-                    chunks = main.chunking_service.chunk_document(markdown_content, metadata)
-                    
-                    # Store chunks in Weaviate
-                    if chunks:
-                        num_added = main.weaviate_service.add_chunks(chunks)
-                        chunks_created += num_added
-                        
-                        # Update document status
-                        update = DocumentUpdate(
-                            is_chunked=True,
-                            chunk_count=len(chunks)
-                        )
-                        main.document_service.update_document(db, document_id, update)
-                
-            except Exception as e:
-                logger.error(f"Error processing filing {filing_data.get('accession_number')}: {e}")
+        for batch, chunks_list in zip(batches, results):
+            if isinstance(chunks_list, Exception):
+                accession_numbers = [metadata["accession_number"] for _, metadata in batch]
+                logger.error(f"Error chunking filings {accession_numbers}: {chunks_list}")
                 continue
-        
-        return SyncResponse(
-            success=True,
-            message=f"Successfully synced {len(filings)} filings",
-            documents_created=documents_created,
-            documents_updated=documents_updated,
-            chunks_created=chunks_created
+            for (_, metadata), chunks in zip(batch, chunks_list):
+                if chunks:
+                    all_chunks.extend(chunks)
+                    chunk_counts[metadata["document_id"]] = len(chunks)
+    
+    # Store all chunks in a single Weaviate batch
+    if all_chunks:
+        chunks_created, failed_document_ids = await asyncio.to_thread(
+            services.weaviate.add_chunks, all_chunks
         )
-        
+        if failed_document_ids:
+            # Chunk IDs are deterministic, so the retry overwrites the chunks
+            # that did get stored rather than duplicating them
+            logger.warning(
+                f"Only {chunks_created} of {len(all_chunks)} chunks were stored; "
+                f"leaving {len(failed_document_ids)} documents unmarked so the next sync retries them"
+            )
+            chunk_counts = {
+                document_id: count
+                for document_id, count in chunk_counts.items()
+                if str(document_id) not in failed_document_ids
+            }
+    
+    # Update all document statuses at once
+    await asyncio.to_thread(services.documents.bulk_mark_chunked, db, chunk_counts)
+    await asyncio.to_thread(db.commit)
+    
+    return SyncResponse(
+        success=True,
+        message=f"Successfully synced {len(filings)} filings",
+        documents_created=documents_created,
+        documents_updated=documents_updated,
+        chunks_created=chunks_created
+    )
+
+
+async def run_sync_job(services: Services, job_id: UUID, request: SyncRequest):
+    """
+    Run a sync job in the background, recording its progress in services.sync_jobs.
+    Uses its own database session since the request session is closed by now.
+    """
+    job = services.sync_jobs[job_id]
+    job.status = "running"
+    
+    # The job runs after the response is sent, so the ?profile=1
+    # middleware can't see it; log its profile instead
+    profiler = None
+    if get_settings().profiling_enabled:
+        try:
+            from pyinstrument import Profiler
+            profiler = Profiler(async_mode="enabled")
+            profiler.start()
+        except ImportError:
+            # Already warned about at startup; run the job unprofiled
+            pass
+    
+    db = SessionLocal()
+    try:
+        job.result = await _sync_filings(services, db, request)
+        job.status = "completed"
     except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error syncing documents: {str(e)}"
-        )
+        logger.error(f"Sync job {job_id} failed: {e}")
+        job.status = "failed"
+        job.error = f"Error syncing documents: {str(e)}"
+    finally:
+        db.close()
+        job.finished_at = datetime.now(timezone.utc)
+        if profiler:
+            profiler.stop()
+            logger.info(f"Sync job {job_id} profile:\n{profiler.output_text()}")
+
+
+def _evict_finished_jobs(services: Services, now: datetime):
+    """Forget sync jobs that finished more than SYNC_JOB_TTL ago."""
+    expired = [
+        job_id for job_id, job in services.sync_jobs.items()
+        if job.finished_at is not None and now - job.finished_at > SYNC_JOB_TTL
+    ]
+    for job_id in expired:
+        del services.sync_jobs[job_id]
+
+
+@router.post("/documents/sync", response_model=SyncJob, status_code=202)
+async def sync_documents(
+    request: SyncRequest,
+    background_tasks: BackgroundTasks,
+    services: Services = Depends(get_services)
+):
+    """
+    Start syncing SEC filings from Edgar API in the background.
+    Returns a job that can be polled via GET /documents/sync/{job_id}.
+    """
+    job = SyncJob(
+        job_id=uuid4(),
+        status="queued",
+        created_at=datetime.now(timezone.utc)
+    )
+    _evict_finished_jobs(services, job.created_at)
+    services.sync_jobs[job.job_id] = job
+    background_tasks.add_task(run_sync_job, services, job.job_id, request)
+    
+    return job
+
+
+@router.get("/documents/sync/{job_id}", response_model=SyncJob)
+async def get_sync_job(job_id: UUID, services: Services = Depends(get_services)):
+    """
+    Get the status of a sync job, including its result once completed.
+    """
+    job = services.sync_jobs.get(job_id)
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Sync job not found")
+    
+    return job
 
 
 @router.get("/filing-types", response_model=list[FilingType])
-async def list_filing_types(db: Session = Depends(get_db)):
+async def list_filing_types(
+    db: Session = Depends(get_db),
+    services: Services = Depends(get_services)
+):
     """
     List all available filing types.
     """
-    return main.document_service.get_filing_types(db)
+    return services.documents.get_filing_types(db)
 
@@ -2,11 +2,12 @@
 Search router for RAG-based document search.
 Provides endpoints for hybrid search with AI-generated answers.
 """
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from ..database import get_db
-from ..schemas import SearchRequest, SearchResponse, ChunkResult
-from .. import main
+from ..schemas import SearchRequest, SearchResponse, SEARCH_RESPONSE_ADAPTER
+from ..dependencies import Services, get_services
 
 router = APIRouter()
 
@@ -14,19 +15,20 @@ router = APIRouter()
 @router.post("/search", response_model=SearchResponse)
 async def search_documents(
     request: SearchRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    services: Services = Depends(get_services)
 ):
     """
     Search SEC documents using hybrid search and get AI-generated answer.
     
     - Performs hybrid search (75% semantic vector search, 25% keyword BM25)
     - Uses Weaviate 'like' filter for partial company name matching
-    - Filters results with score > 0.75
+    - Filters results with score > 0.7
     - Generates natural language answer using Gemini Flash in Markdown format
     - Returns answer with source chunks and metadata
     """
     # Perform hybrid search with pattern matching for company names
-    chunks = main.search_service.hybrid_search(
+    chunks = await services.search.hybrid_search(
         query=request.query,
         company_filter=request.company_filter,
         filing_type_filter=request.filing_type_filter,
@@ -35,24 +37,43 @@ async def search_documents(
     
     # Generate answer with Gemini (async operation)
     if chunks:
-        answer = await main.gemini_service.answer_query(request.query, chunks)
+        answer = await services.gemini.answer_query(request.query, chunks)
     else:
         answer = "No relevant information found in the SEC filings database. Please try rephrasing your question or search for a different topic."
     
-    # Format response
-    chunk_results = [
-        ChunkResult(
-            content=chunk["content"],
-            score=chunk["score"],
-            metadata=chunk["metadata"]
-        )
-        for chunk in chunks
-    ]
-    
-    return SearchResponse(
+    # Chunks come straight from Weaviate in the response shape, so skip validation
+    search_response = SearchResponse.model_construct(
         query=request.query,
         answer=answer,
-        chunks=chunk_results,
-        total_chunks=len(chunk_results)
+        chunks=chunks,
+        total_chunks=len(chunks)
+    )
+    return Response(
+        content=SEARCH_RESPONSE_ADAPTER.dump_json(search_response),
+        media_type="application/json"
     )
 
+
+@router.post("/search/stream")
+async def search_documents_stream(
+    request: SearchRequest,
+    services: Services = Depends(get_services)
+):
+    """
+    Search SEC documents and stream the AI-generated answer as it is written.
+    
+    - Runs the same hybrid search as /search
+    - Streams Gemini's Markdown answer as it is generated, so clients can
+      render it before the full answer is done
+    """
+    chunks = await services.search.hybrid_search(
+        query=request.query,
+        company_filter=request.company_filter,
+        filing_type_filter=request.filing_type_filter,
+        limit=request.limit or 5
+    )
+    
+    return StreamingResponse(
+        services.gemini.answer_query_stream(request.query, chunks),
+        media_type="text/markdown"
+    )
@@ -2,7 +2,7 @@
 Pydantic schemas for request/response validation.
 Defines data structures for API endpoints.
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 from typing import Optional, List, Dict, Any
 from datetime import date, datetime
 from uuid import UUID
@@ -56,17 +56,13 @@ class Document(DocumentBase):
         from_attributes = True
 
 
-class DocumentWithText(Document):
-    """Document schema including markdown content."""
-    markdown_content: Optional[str] = None
-
-
 class DocumentList(BaseModel):
     """Paginated list of documents."""
     items: List[Document]
-    total: int
+    total: Optional[int] = None
     skip: int
     limit: int
+    next_cursor: Optional[str] = None
 
 
 # Sync Request Schema
@@ -93,6 +89,16 @@ class SyncResponse(BaseModel):
     chunks_created: int
 
 
+class SyncJob(BaseModel):
+    """Status of a background sync job."""
+    job_id: UUID
+    status: str = Field(description="One of: queued, running, completed, failed")
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    result: Optional[SyncResponse] = None
+    error: Optional[str] = None
+
+
 # Health Check Schema
 class HealthCheck(BaseModel):
     """Health check response."""
@@ -120,17 +126,18 @@ class SearchRequest(BaseModel):
     limit: Optional[int] = Field(default=5, ge=1, le=20, description="Maximum number of results")
 
 
-class ChunkResult(BaseModel):
-    """Individual chunk result with score and metadata."""
-    content: str
-    score: float
-    metadata: Dict[str, Any]
-
-
 class SearchResponse(BaseModel):
-    """Response schema for search endpoint."""
+    """
+    Response schema for search endpoint.
+    Each chunk is the dict produced by SearchService (content, score and
+    metadata), passed through as-is without per-chunk validation.
+    """
     query: str
     answer: str
-    chunks: List[ChunkResult]
+    chunks: List[Dict[str, Any]]
     total_chunks: int
 
+
+# Serializers built once at import for responses returned as raw JSON
+DOCUMENT_LIST_ADAPTER = TypeAdapter(DocumentList)
+SEARCH_RESPONSE_ADAPTER = TypeAdapter(SearchResponse)
@@ -1,3 +1,3 @@
 # Services package
-# Service instances are now initialized in main.py
+# Service instances are initialized in the app lifespan (see dependencies.Services)
 
@@ -1,27 +1,105 @@
 """
 Document chunking service for RAG preparation.
-Splits documents into manageable chunks for vector storage using LangChain.
+Splits documents into manageable, overlapping chunks for vector storage.
 """
-from typing import List, Dict
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from typing import List, Dict, Optional, Sequence, Tuple
+
+
+class TextSplitter:
+    """
+    Splits text into overlapping chunks, preferring to cut on the
+    highest-priority separator found in each window.
+    
+    Cut points are located with str.rfind/str.find over each window rather
+    than by recursively splitting the whole text on every separator, so
+    the work per chunk stays in C.
+    """
+    
+    def __init__(
+        self,
+        chunk_size: int,
+        chunk_overlap: int,
+        separators: Sequence[str]
+    ):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = tuple(sep for sep in separators if sep)
+    
+    def _find_cut(self, text: str, start: int, end: int) -> int:
+        """Find where to end the chunk starting at start, at or before end."""
+        # Leave room for the overlap so the next chunk always moves forward
+        lower = start + self.chunk_overlap + 1
+        for sep in self.separators:
+            cut = text.rfind(sep, lower, end)
+            if cut != -1:
+                return cut
+        # No separator in range, hard cut at the chunk size
+        return end
+    
+    def _find_next_start(self, text: str, cut: int) -> int:
+        """Find where the next chunk starts so it overlaps on a separator boundary."""
+        lower = cut - self.chunk_overlap
+        for sep in self.separators:
+            start = text.find(sep, lower, cut)
+            if start != -1:
+                return start
+        return lower
+    
+    def split_text(self, text: str) -> List[str]:
+        """
+        Split text into chunks of at most chunk_size characters, each
+        overlapping the previous one by up to chunk_overlap characters.
+        
+        Args:
+            text: Full text to split
+            
+        Returns:
+            List of non-empty, whitespace-stripped chunks
+        """
+        chunks = []
+        length = len(text)
+        start = 0
+        
+        while start < length:
+            end = start + self.chunk_size
+            if end >= length:
+                cut = length
+            else:
+                cut = self._find_cut(text, start, end)
+            
+            chunk = text[start:cut].strip()
+            if chunk:
+                chunks.append(chunk)
+            
+            if cut >= length:
+                break
+            start = self._find_next_start(text, cut)
+        
+        return chunks
+
+
+# Per-process service used by chunk_document_batch in pool workers
+_worker_service: Optional["ChunkingService"] = None
 
 
 class ChunkingService:
-    """Service for chunking documents using LangChain's RecursiveCharacterTextSplitter."""
+    """Service for chunking documents into overlapping text chunks."""
     
     def __init__(self):
-        """Initialize chunking service with LangChain splitter."""
-        # Configure the recursive splitter based on notebook settings
-        self.splitter = RecursiveCharacterTextSplitter(
-            separators=["---", "\n\n", "\n", " ", ""],
+        """Initialize chunking service with a shared splitter."""
+        # Configure the splitter based on notebook settings
+        self.splitter = TextSplitter(
+            separators=["---", "\n\n", "\n", " "],
             chunk_size=5000,
             chunk_overlap=2000,
-            add_start_index=True,  # Useful for tracking where chunks came from
         )
     
     def chunk_text(self, text: str) -> List[str]:
         """
-        Split text into chunks using LangChain's RecursiveCharacterTextSplitter.
+        Split text into overlapping chunks.
         
         Args:
             text: Full text to chunk
@@ -29,12 +107,7 @@ class ChunkingService:
         Returns:
             List of text chunks
         """
-        if not text:
-            return []
-        
-        # Use LangChain's splitter
-        chunks = self.splitter.create_documents([text])
-        return [chunk.page_content for chunk in chunks]
+        return self.splitter.split_text(text) if text else []
     
     def chunk_document(
         self,
@@ -52,25 +125,55 @@ class ChunkingService:
             List of chunk dictionaries with content and metadata
         """
         text_chunks = self.chunk_text(markdown_content)
+        total = len(text_chunks)
         
-        result = []
+        # Metadata is the same for every chunk, so look it up once
+        document_id = str(document_metadata.get("document_id"))
+        accession_number = document_metadata.get("accession_number")
+        company_name = document_metadata.get("company_name")
+        filing_type = document_metadata.get("filing_type")
+        filing_date = document_metadata.get("filing_date")
+        document_url = document_metadata.get("document_url")
+        created_at = document_metadata.get("created_at")
+        
+        result = [None] * total
         for i, chunk_content in enumerate(text_chunks):
-            chunk_data = {
+            result[i] = {
                 "chunk_index": i,
                 "content": chunk_content,
-                "document_id": str(document_metadata.get("document_id")),
-                "accession_number": document_metadata.get("accession_number"),
-                "company_name": document_metadata.get("company_name"),
-                "filing_type": document_metadata.get("filing_type"),
-                "filing_date": document_metadata.get("filing_date"),
-                "document_url": document_metadata.get("document_url"),
-                "created_at": document_metadata.get("created_at"),
+                "document_id": document_id,
+                "accession_number": accession_number,
+                "company_name": company_name,
+                "filing_type": filing_type,
+                "filing_date": filing_date,
+                "document_url": document_url,
+                "created_at": created_at,
                 "metadata": {
-                    "total_chunks": len(text_chunks),
-                    "chunk_position": (i + 1) / len(text_chunks),
+                    "total_chunks": total,
+                    "chunk_position": (i + 1) / total,
                 }
             }
-            result.append(chunk_data)
         
         return result
-
+    
+    @staticmethod
+    def chunk_document_batch(documents: List[Tuple[str, Dict]]) -> List[List[Dict]]:
+        """
+        Chunk several documents, for use as a process pool task.
+        The service is created inside the worker so only the text and
+        metadata are pickled, not the splitter.
+        
+        Args:
+            documents: List of (markdown_content, document_metadata) pairs
+            
+        Returns:
+            List of chunk lists, one per input document
+        """
+        global _worker_service
+        if _worker_service is None:
+            _worker_service = ChunkingService()
+        
+        return [
+            _worker_service.chunk_document(markdown_content, document_metadata)
+            for markdown_content, document_metadata in documents
+        ]
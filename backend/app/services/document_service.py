@@ -2,9 +2,11 @@
 Document service for CRUD operations on Supabase.
 Handles business logic for document management.
 """
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
-from typing import List, Optional
+import base64
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy import and_, or_, func, select, text, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from typing import Dict, Iterator, List, Optional
 from datetime import date
 from uuid import UUID
 
@@ -15,6 +17,10 @@ from ..schemas import DocumentCreate, DocumentUpdate
 class DocumentService:
     """Service for document-related operations."""
     
+    # Rows per INSERT in bulk_create_documents; each row carries a filing's
+    # full markdown, so this bounds the size of a single statement
+    BULK_INSERT_BATCH_SIZE = 20
+    
     @staticmethod
     def create_document(db: Session, document_data: DocumentCreate) -> Document:
         """Create a new document in the database."""
@@ -33,11 +39,80 @@ class DocumentService:
         db.refresh(db_document)
         return db_document
     
+    @staticmethod
+    def bulk_create_documents(
+        db: Session,
+        documents_data: List[DocumentCreate]
+    ) -> Dict[str, UUID]:
+        """
+        Insert many documents with multi-row INSERTs of BULK_INSERT_BATCH_SIZE rows.
+        Rows whose accession number already exists are skipped.
+        Does not commit; the caller owns the transaction.
+        
+        Returns:
+            Mapping of accession number to ID for the inserted documents
+        """
+        created = {}
+        batch_size = DocumentService.BULK_INSERT_BATCH_SIZE
+        for start in range(0, len(documents_data), batch_size):
+            batch = documents_data[start:start + batch_size]
+            stmt = (
+                insert(Document)
+                .values([document.model_dump() for document in batch])
+                .on_conflict_do_nothing(index_elements=["accession_number"])
+                .returning(Document.accession_number, Document.id)
+            )
+            created.update({row.accession_number: row.id for row in db.execute(stmt)})
+        
+        return created
+    
+    @staticmethod
+    def bulk_mark_chunked(db: Session, chunk_counts: Dict[UUID, int]):
+        """
+        Mark many documents as chunked in a single executemany UPDATE.
+        Does not commit; the caller owns the transaction.
+        
+        Args:
+            chunk_counts: Mapping of document ID to number of chunks stored
+        """
+        if not chunk_counts:
+            return
+        
+        db.execute(
+            update(Document),
+            [
+                {"id": document_id, "is_chunked": True, "chunk_count": count}
+                for document_id, count in chunk_counts.items()
+            ]
+        )
+    
     @staticmethod
     def get_document(db: Session, document_id: UUID) -> Optional[Document]:
         """Get a document by ID."""
         return db.query(Document).filter(Document.id == document_id).first()
     
+    @staticmethod
+    def iter_markdown_content(
+        db: Session,
+        document_id: UUID,
+        chunk_size: int = 65536
+    ) -> Iterator[str]:
+        """
+        Yield a document's markdown content in pieces of chunk_size characters.
+        
+        The content is read in a single query. Slicing it with repeated substr()
+        calls would re-read the value from the start on every call, since a
+        UTF-8 text value can't be sliced by character offset.
+        """
+        content = db.execute(
+            select(Document.markdown_content).where(Document.id == document_id)
+        ).scalar()
+        if not content:
+            return
+        
+        for start in range(0, len(content), chunk_size):
+            yield content[start:start + chunk_size]
+    
     @staticmethod
     def get_document_by_accession(db: Session, accession_number: str) -> Optional[Document]:
         """Get a document by accession number."""
@@ -45,6 +120,50 @@ class DocumentService:
             Document.accession_number == accession_number
         ).first()
     
+    @staticmethod
+    def encode_cursor(document: Document) -> str:
+        """Encode a document's (filing_date, id) position as a pagination cursor."""
+        raw = f"{document.filing_date.isoformat()}|{document.id}"
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+    
+    @staticmethod
+    def decode_cursor(cursor: str) -> tuple[date, UUID]:
+        """
+        Decode a pagination cursor into its (filing_date, id) position.
+        
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+            filing_date, document_id = raw.split("|", 1)
+            return date.fromisoformat(filing_date), UUID(document_id)
+        except Exception as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+    
+    @staticmethod
+    def estimate_document_count(db: Session) -> int:
+        """Get the planner's row estimate for the documents table."""
+        estimate = db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = :table"),
+            {"table": Document.__tablename__}
+        ).scalar()
+        return estimate or 0
+    
+    @staticmethod
+    def get_documents_by_accessions(
+        db: Session,
+        accession_numbers: List[str]
+    ) -> Dict[str, Document]:
+        """Get documents for many accession numbers in one query, keyed by accession number."""
+        if not accession_numbers:
+            return {}
+        
+        documents = db.query(Document).filter(
+            Document.accession_number.in_(accession_numbers)
+        ).all()
+        return {document.accession_number: document for document in documents}
+    
     @staticmethod
     def list_documents(
         db: Session,
@@ -54,44 +173,94 @@ class DocumentService:
         company_name: Optional[str] = None,
         start_date: Optional[date] = None,
         end_date: Optional[date] = None,
-        search: Optional[str] = None
-    ) -> tuple[List[Document], int]:
+        search: Optional[str] = None,
+        cursor: Optional[str] = None,
+        include_total: bool = False,
+        estimate_total: bool = False
+    ) -> tuple[List[Document], Optional[int], Optional[str]]:
         """
         List documents with optional filtering.
         
+        Uses keyset pagination on (filing_date DESC, id DESC) when a cursor
+        is given, falling back to offset pagination via skip otherwise.
+        The total is only computed when include_total is set. It is an exact
+        count unless estimate_total is also set, in which case unfiltered
+        listings use the planner's row estimate; that can lag recent inserts,
+        so it must not drive offset paging.
+        
         Returns:
-            Tuple of (documents list, total count)
+            Tuple of (documents list, total count or None, next cursor or None)
+        
+        Raises:
+            ValueError: If the cursor is malformed
         """
-        query = db.query(Document)
+        # Build filters once, shared by the page and count queries
+        filters = []
         
-        # Apply filters
         if filing_type:
-            query = query.filter(Document.filing_type == filing_type)
+            filters.append(Document.filing_type == filing_type)
         
         if company_name:
-            query = query.filter(Document.company_name.ilike(f"%{company_name}%"))
+            filters.append(Document.company_name.ilike(f"%{company_name}%"))
         
         if start_date:
-            query = query.filter(Document.filing_date >= start_date)
+            filters.append(Document.filing_date >= start_date)
         
         if end_date:
-            query = query.filter(Document.filing_date <= end_date)
+            filters.append(Document.filing_date <= end_date)
         
         if search:
-            search_filter = or_(
+            filters.append(or_(
                 Document.company_name.ilike(f"%{search}%"),
                 Document.description.ilike(f"%{search}%"),
                 Document.filing_type.ilike(f"%{search}%")
-            )
-            query = query.filter(search_filter)
+            ))
+        
+        # Get total count only when asked for
+        total = None
+        if include_total:
+            if estimate_total and not filters:
+                total = DocumentService.estimate_document_count(db)
+            # Exact count unless an estimate was requested and is available
+            if total is None or total <= 0:
+                # Plain aggregate, no subquery wrapping or ORDER BY to evaluate
+                total = db.query(func.count(Document.id)).filter(*filters).scalar()
         
-        # Get total count
-        total = query.count()
+        # Only load the columns the list response needs
+        query = db.query(Document).options(load_only(
+            Document.id,
+            Document.accession_number,
+            Document.company_name,
+            Document.company_cik,
+            Document.filing_type,
+            Document.filing_date,
+            Document.description,
+            Document.document_url,
+            Document.is_chunked,
+            Document.chunk_count,
+            Document.created_at,
+            Document.updated_at
+        )).filter(*filters)
         
         # Apply pagination and ordering
-        documents = query.order_by(Document.filing_date.desc()).offset(skip).limit(limit).all()
+        if cursor:
+            cursor_date, cursor_id = DocumentService.decode_cursor(cursor)
+            query = query.filter(
+                tuple_(Document.filing_date, Document.id) < tuple_(cursor_date, cursor_id)
+            )
         
-        return documents, total
+        query = query.order_by(Document.filing_date.desc(), Document.id.desc())
+        
+        if skip and not cursor:
+            query = query.offset(skip)
+        
+        documents = query.limit(limit).all()
+        
+        next_cursor = None
+        if len(documents) == limit:
+            next_cursor = DocumentService.encode_cursor(documents[-1])
+        
+        return documents, total, next_cursor
     
     @staticmethod
     def update_document(
@@ -132,7 +301,7 @@ class DocumentService:
     
     @staticmethod
     def initialize_filing_types(db: Session):
-        """Initialize common filing types."""
+        """Initialize common filing types in a single upsert."""
         common_types = [
             ("10-K", "Annual Report"),
             ("10-Q", "Quarterly Report"),
@@ -142,6 +311,14 @@ class DocumentService:
             ("DEF 14A", "Proxy Statement"),
         ]
         
-        for code, description in common_types:
-            DocumentService.create_filing_type(db, code, description)
+        stmt = (
+            insert(FilingType)
+            .values([
+                {"code": code, "description": description}
+                for code, description in common_types
+            ])
+            .on_conflict_do_nothing(index_elements=["code"])
+        )
+        db.execute(stmt)
+        db.commit()
 
@@ -4,12 +4,57 @@ Uses Google's Gemini Flash model for RAG responses.
 """
 import logging
 from google import genai
-from typing import List, Dict
+from google.genai import types
+from typing import AsyncIterator, List, Dict, Optional
 import os
 import asyncio
-from ..config import settings
+from ..config import get_settings
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Must match the Weaviate collection's vectorizer so query vectors are comparable
+EMBEDDING_MODEL = "gemini-embedding-001"
+EMBEDDING_DIMENSIONS = 3072
+
+# Prompt scaffold; filled with the formatted excerpts and the user question
+_PROMPT_TEMPLATE = """You are a financial analyst assistant. Answer the user's question based on the SEC filing excerpts provided below.
+
+SEC Filing Excerpts:
+{context}
+
+User Question: {query}
+
+Instructions:
+- Provide a clear, accurate answer based only on the information in the excerpts
+- Cite which source(s) you're using (e.g., "According to Source 1...")
+- If the excerpts don't contain enough information, say so
+- Be specific with numbers, dates, and facts when available
+- Use a professional but conversational tone
+
+**FORMATTING REQUIREMENTS:**
+- Format your response in Markdown
+- Use **bold** for emphasis on key terms, numbers, and important facts
+- Use ## for section headings if your answer has multiple parts
+- Use bullet points (-) for lists
+- Use > for important quotes or key findings
+- Keep paragraphs concise and well-structured
+
+Answer:"""
+
+
+def _low_confidence_answer(chunks: List[Dict]) -> str:
+    """Build the markdown reply used instead of Gemini when no chunk is a strong match."""
+    sources = dict.fromkeys(
+        f"- **{metadata['company_name']}** - {metadata['filing_type']} (Filed: {metadata['filing_date']})"
+        for chunk in chunks
+        for metadata in (chunk["metadata"],)
+    )
+    return (
+        "The SEC filing excerpts found don't match this question closely enough to answer it reliably. "
+        "These filings were the closest matches and may be worth reviewing directly:\n\n"
+        + "\n".join(sources)
+    )
 
 
 class GeminiService:
@@ -23,10 +68,42 @@ class GeminiService:
             self.client = None
         else:
             self.client = genai.Client(api_key=api_key)
+        
+        # Answers currently being generated, so identical concurrent requests share one
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+    
+    def embed_query(self, text: str) -> Optional[List[float]]:
+        """
+        Embed a search query with the same model Weaviate uses for chunks.
+        
+        Args:
+            text: Query text
+            
+        Returns:
+            Embedding vector, or None if Gemini is unavailable
+        """
+        if not self.client:
+            return None
+        
+        try:
+            response = self.client.models.embed_content(
+                model=EMBEDDING_MODEL,
+                contents=text,
+                config=types.EmbedContentConfig(
+                    task_type="RETRIEVAL_QUERY",
+                    output_dimensionality=EMBEDDING_DIMENSIONS
+                )
+            )
+            return response.embeddings[0].values
+            
+        except Exception as e:
+            logger.error(f"Error embedding query: {e}")
+            return None
     
     async def answer_query(self, query: str, chunks: List[Dict]) -> str:
         """
         Use Gemini Flash to answer query based on retrieved chunks.
+        Concurrent calls with the same query and chunks share one generation.
         
         Args:
             query: User's question
@@ -35,59 +112,73 @@ class GeminiService:
         Returns:
             Natural language answer from Gemini
         """
+        key = (query, tuple(
+            (chunk["metadata"]["accession_number"], chunk["metadata"]["chunk_index"])
+            for chunk in chunks
+        ))
+        
+        # Join an identical answer that is already being generated instead of repeating it
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._join_stream(query, chunks))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        
+        # Shielded so one caller disconnecting doesn't cancel the others' answer
+        return await asyncio.shield(task)
+    
+    async def _join_stream(self, query: str, chunks: List[Dict]) -> str:
+        """Collect the streamed answer into a single string."""
+        return "".join([part async for part in self.answer_query_stream(query, chunks)])
+    
+    async def answer_query_stream(self, query: str, chunks: List[Dict]) -> AsyncIterator[str]:
+        """
+        Stream Gemini Flash's answer to the query as it is generated.
+        
+        Args:
+            query: User's question
+            chunks: List of chunk dictionaries with content and metadata
+            
+        Yields:
+            Pieces of the markdown answer, in order
+        """
         if not self.client:
-            return "Gemini service is not configured. Please set GEMINI_API_KEY environment variable."
+            yield "Gemini service is not configured. Please set GEMINI_API_KEY environment variable."
+            return
         
         if not chunks:
-            return "No relevant information found in the SEC filings database. Please try rephrasing your question or search for a different topic."
+            yield "No relevant information found in the SEC filings database. Please try rephrasing your question or search for a different topic."
+            return
         
-        # Format context from chunks
-        context_parts = []
-        for i, chunk in enumerate(chunks, 1):
-            metadata = chunk["metadata"]
-            context_parts.append(
-                f"[Source {i}] {metadata['company_name']} - {metadata['filing_type']} "
-                f"(Filed: {metadata['filing_date']}):\n{chunk['content']}\n"
-            )
+        # Weak matches rarely support a useful answer, so point at the sources instead.
+        # Unscored chunks (filter-only and BM25 results) aren't held to the floor.
+        scores = [chunk["score"] for chunk in chunks if chunk.get("score") is not None]
+        if scores and max(scores) < settings.answer_min_score:
+            yield _low_confidence_answer(chunks)
+            return
         
-        context = "\n---\n".join(context_parts)
+        # Format context from chunks
+        context_parts = [
+            f"[Source {i}] {metadata['company_name']} - {metadata['filing_type']} "
+            f"(Filed: {metadata['filing_date']}):\n{chunk['content']}\n"
+            for i, chunk in enumerate(chunks, 1)
+            for metadata in (chunk["metadata"],)
+        ]
         
         # Create prompt for Gemini
-        prompt = f"""You are a financial analyst assistant. Answer the user's question based on the SEC filing excerpts provided below.
-
-SEC Filing Excerpts:
-{context}
-
-User Question: {query}
-
-Instructions:
-- Provide a clear, accurate answer based only on the information in the excerpts
-- Cite which source(s) you're using (e.g., "According to Source 1...")
-- If the excerpts don't contain enough information, say so
-- Be specific with numbers, dates, and facts when available
-- Use a professional but conversational tone
-
-**FORMATTING REQUIREMENTS:**
-- Format your response in Markdown
-- Use **bold** for emphasis on key terms, numbers, and important facts
-- Use ## for section headings if your answer has multiple parts
-- Use bullet points (-) for lists
-- Use > for important quotes or key findings
-- Keep paragraphs concise and well-structured
-
-Answer:"""
+        prompt = _PROMPT_TEMPLATE.format(context="\n---\n".join(context_parts), query=query)
         
         try:
-            # Call Gemini Flash in a thread pool to avoid blocking
-            # The genai library is synchronous, so we run it in a thread
-            response = await self.client.aio.models.generate_content(
+            # Forward text as Gemini produces it instead of waiting for the full answer
+            stream = await self.client.aio.models.generate_content_stream(
                 model="gemini-3-flash-preview",
                 contents=prompt
             )
-            
-            return response.text
+            async for response in stream:
+                if response.text:
+                    yield response.text
             
         except Exception as e:
             logger.error(f"Error calling Gemini API: {e}")
-            return f"Error generating answer: {str(e)}"
+            yield f"Error generating answer: {str(e)}"
 
@@ -2,109 +2,352 @@
 Search service for hybrid search using Weaviate.
 Implements semantic + keyword search with score filtering.
 """
+import asyncio
+import functools
 import logging
-from typing import List, Dict, Optional
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional, Sequence
+import numpy as np
 import weaviate.classes as wvc
 
 logger = logging.getLogger(__name__)
 
+# DocumentChunk properties returned by searches unless the caller asks for fewer
+CHUNK_PROPERTIES = (
+    "content",
+    "companyName",
+    "filingType",
+    "filingDate",
+    "documentUrl",
+    "chunkIndex",
+    "accessionNumber",
+    "chunkCharCount",
+    "totalChunks",
+)
+
+
+@functools.lru_cache(maxsize=128)
+def _build_filter(company_filter: Optional[str], filing_type_filter: Optional[str]):
+    """
+    Build the combined Weaviate filter for a search.
+    
+    Filter objects are immutable, so each one is built once per distinct
+    (company, filing type) pair and reused across queries.
+    
+    Args:
+        company_filter: Optional company name filter (supports partial matching with wildcards)
+        filing_type_filter: Optional filing type filter (10-K, 10-Q, etc.)
+        
+    Returns:
+        Combined filter, or None when neither filter is set
+    """
+    filters = []
+    
+    # Handle company filter with wildcard pattern matching
+    if company_filter:
+        # Use 'like' filter with wildcards for partial matching
+        # Wraps input in wildcards: "Tesla" -> "*Tesla*"
+        filters.append(
+            wvc.query.Filter.by_property("companyName").like(f"*{company_filter}*")
+        )
+    
+    if filing_type_filter:
+        filters.append(
+            wvc.query.Filter.by_property("filingType").equal(filing_type_filter)
+        )
+    
+    # Combine filters with AND logic
+    combined_filter = None
+    if filters:
+        combined_filter = filters[0]
+        for f in filters[1:]:
+            combined_filter = combined_filter & f
+    
+    return combined_filter
+
+
+def _format_result(obj, scored: bool = True) -> Dict:
+    """
+    Map a DocumentChunk object to the chunk dictionary returned by searches.
+    Unscored results (filter-only and BM25 queries) get a score of None.
+    """
+    properties = obj.properties
+    return {
+        "content": properties.get("content", ""),
+        "score": obj.metadata.score if scored else None,
+        "metadata": {
+            "company_name": properties.get("companyName", ""),
+            "filing_type": properties.get("filingType", ""),
+            "filing_date": properties.get("filingDate"),
+            "document_url": properties.get("documentUrl", ""),
+            "chunk_index": properties.get("chunkIndex", 0),
+            "accession_number": properties.get("accessionNumber", ""),
+            "chunk_char_count": properties.get("chunkCharCount", 0),
+            "total_chunks": properties.get("totalChunks", 0),
+        }
+    }
+
 
 class SearchService:
     """Service for performing hybrid search on document chunks."""
     
-    def __init__(self, weaviate_service):
+    # Chunks scoring at or below this are dropped from hybrid results
+    MIN_HYBRID_SCORE = 0.7
+    
+    EXACT_CACHE_SIZE = 512
+    SIMILAR_CACHE_SIZE = 256
+    SIMILARITY_THRESHOLD = 0.95
+    
+    def __init__(self, weaviate_service, gemini_service=None):
         """
         Initialize search service.
         
         Args:
             weaviate_service: Instance of WeaviateService
+            gemini_service: Optional GeminiService used to embed queries for
+                the similarity cache
         """
         self.weaviate = weaviate_service
+        self.gemini = gemini_service
+        
+        # Searches currently running, so identical concurrent requests share one
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        
+        # Result caches, keyed by normalized query, filters and limit.
+        # Both are cleared whenever Weaviate's data version changes.
+        self._cache_lock = threading.Lock()
+        self._cache_version = None
+        self._exact_cache: OrderedDict = OrderedDict()
+        
+        # Similarity cache: a ring buffer of unit-length query vectors, with the
+        # scope (filters, limit and properties) and results stored alongside each row
+        self._vectors: Optional[np.ndarray] = None
+        self._vector_scopes: List = [None] * self.SIMILAR_CACHE_SIZE
+        self._vector_results: List = [None] * self.SIMILAR_CACHE_SIZE
+        self._vector_count = 0
+        self._vector_next = 0
     
-    def hybrid_search(
+    def _check_cache_version(self):
+        """Drop every cached result if chunks were added or deleted since they were stored."""
+        version = self.weaviate.data_version
+        if version != self._cache_version:
+            self._exact_cache.clear()
+            self._vector_count = 0
+            self._vector_next = 0
+            self._cache_version = version
+    
+    def _find_similar(self, scope: tuple, query_vector: np.ndarray) -> Optional[List[Dict]]:
+        """Return cached results for the most similar query with the same scope, if close enough."""
+        if not self._vector_count:
+            return None
+        
+        # Rows are unit length, so one matmul gives every cosine similarity
+        similarities = self._vectors[:self._vector_count] @ query_vector
+        for i in np.argsort(similarities)[::-1]:
+            if similarities[i] < self.SIMILARITY_THRESHOLD:
+                break
+            if self._vector_scopes[i] == scope:
+                return self._vector_results[i]
+        
+        return None
+    
+    def _store(self, key: tuple, scope: tuple, query_vector: Optional[np.ndarray], results: List[Dict]):
+        """Add results to the exact cache and, when a query vector is available, the similarity cache."""
+        self._exact_cache[key] = results
+        if len(self._exact_cache) > self.EXACT_CACHE_SIZE:
+            self._exact_cache.popitem(last=False)
+        
+        if query_vector is None:
+            return
+        
+        if self._vectors is None or self._vectors.shape[1] != query_vector.shape[0]:
+            self._vectors = np.empty((self.SIMILAR_CACHE_SIZE, query_vector.shape[0]), dtype=np.float32)
+            self._vector_count = 0
+            self._vector_next = 0
+        
+        i = self._vector_next
+        self._vectors[i] = query_vector
+        self._vector_scopes[i] = scope
+        self._vector_results[i] = results
+        self._vector_next = (i + 1) % self.SIMILAR_CACHE_SIZE
+        self._vector_count = min(self._vector_count + 1, self.SIMILAR_CACHE_SIZE)
+    
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        """Embed a query as a unit-length vector, or None if embeddings are unavailable."""
+        if self.gemini is None:
+            return None
+        
+        values = self.gemini.embed_query(text)
+        if not values:
+            return None
+        
+        vector = np.asarray(values, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+    
+    async def hybrid_search(
         self,
         query: str,
         company_filter: Optional[str] = None,
         filing_type_filter: Optional[str] = None,
-        limit: int = 5
+        limit: int = 5,
+        return_properties: Optional[Sequence[str]] = None
     ) -> List[Dict]:
         """
         Perform hybrid search with alpha=0.75 (75% vector, 25% BM25).
-        Only return chunks with score > 0.75.
+        Only return chunks with score > MIN_HYBRID_SCORE.
         Uses Weaviate's 'like' filter for partial company name matching.
+        Concurrent identical searches share a single Weaviate request.
+        Results are cached per query, filters, limit and properties; a query whose
+        embedding is nearly identical to a cached one reuses its results.
+        An empty query returns filtered chunks, and a single-word query
+        without filters uses BM25 alone; both come back with score None.
         
         Args:
             query: Search query string
             company_filter: Optional company name filter (supports partial matching with wildcards)
             filing_type_filter: Optional filing type filter (10-K, 10-Q, etc.)
             limit: Maximum number of results to return
+            return_properties: Chunk properties to fetch (defaults to CHUNK_PROPERTIES);
+                omitted ones come back as empty values
             
         Returns:
             List of chunk dictionaries with content, score, and metadata
         """
+        properties = tuple(return_properties) if return_properties is not None else CHUNK_PROPERTIES
+        key = (" ".join(query.lower().split()), company_filter, filing_type_filter, limit, properties)
+        
+        # Join an identical search that is already running instead of repeating it
+        task = self._inflight.get(key)
+        if task is None:
+            # Weaviate and embedding calls are blocking, so keep them off the event loop
+            task = asyncio.ensure_future(asyncio.to_thread(
+                self._hybrid_search_sync, query, company_filter, filing_type_filter, limit, properties
+            ))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        
+        # Shielded so one caller disconnecting doesn't cancel the others' search
+        return await asyncio.shield(task)
+    
+    def _hybrid_search_sync(
+        self,
+        query: str,
+        company_filter: Optional[str],
+        filing_type_filter: Optional[str],
+        limit: int,
+        properties: tuple
+    ) -> List[Dict]:
+        """Blocking implementation of hybrid_search, including the cache lookups."""
         if not self.weaviate.is_connected():
             return []
         
+        query = query.strip()
+        normalized_query = " ".join(query.lower().split())
+        scope = (company_filter, filing_type_filter, limit, properties)
+        key = (normalized_query,) + scope
+        
+        with self._cache_lock:
+            self._check_cache_version()
+            cached = self._exact_cache.get(key)
+            if cached is not None:
+                self._exact_cache.move_to_end(key)
+                return cached
+        
+        # The local embedding doubles as the hybrid query vector, so Weaviate
+        # does not have to call the vectorizer again on a miss
+        query_vector = None
+        if self._uses_vector(query, company_filter, filing_type_filter):
+            query_vector = self._embed(normalized_query)
+        if query_vector is not None:
+            with self._cache_lock:
+                cached = self._find_similar(scope, query_vector)
+                if cached is not None:
+                    self._store(key, scope, None, cached)
+                    return cached
+        
         try:
-            collection = self.weaviate.client.collections.get(self.weaviate.COLLECTION_NAME)
-            
-            # Build filters
-            filters = []
-            
-            # Handle company filter with wildcard pattern matching
-            if company_filter:
-                # Use 'like' filter with wildcards for partial matching
-                # Wraps input in wildcards: "Tesla" -> "*Tesla*"
-                pattern = f"*{company_filter}*"
-                filters.append(
-                    wvc.query.Filter.by_property("companyName").like(pattern)
-                )
-                logger.info(f"Applying Weaviate filter: companyName LIKE '{pattern}'")
-            
-            if filing_type_filter:
-                filters.append(
-                    wvc.query.Filter.by_property("filingType").equal(filing_type_filter)
-                )
-            
-            # Combine filters with AND logic
-            combined_filter = None
-            if filters:
-                combined_filter = filters[0]
-                for f in filters[1:]:
-                    combined_filter = combined_filter & f
-            
-            # Perform hybrid search with alpha=0.75
-            # alpha=0.75 means 75% vector search (semantic), 25% BM25 (keyword)
-            response = collection.query.hybrid(
-                query=query,
-                alpha=0.75,
-                limit=limit,
-                return_metadata=wvc.query.MetadataQuery(score=True),
-                filters=combined_filter
+            results = self._run_search(
+                query, company_filter, filing_type_filter, limit, properties, query_vector
             )
-            
-            # Filter by score > 0.7 and format results
-            results = []
-            for obj in response.objects:
-                # Only keep results with score > 0.75
-                if obj.metadata.score > 0.7:
-                    results.append({
-                        "content": obj.properties.get("content", ""),
-                        "score": obj.metadata.score,
-                        "metadata": {
-                            "company_name": obj.properties.get("companyName", ""),
-                            "filing_type": obj.properties.get("filingType", ""),
-                            "filing_date": obj.properties.get("filingDate"),
-                            "document_url": obj.properties.get("documentUrl", ""),
-                            "chunk_index": obj.properties.get("chunkIndex", 0),
-                            "accession_number": obj.properties.get("accessionNumber", ""),
-                            "chunk_char_count": obj.properties.get("chunkCharCount", 0),
-                            "total_chunks": obj.properties.get("totalChunks", 0),
-                        }
-                    })
-            
-            return results
-            
         except Exception as e:
             logger.error(f"Error performing hybrid search: {e}")
             return []
+        
+        with self._cache_lock:
+            self._check_cache_version()
+            self._store(key, scope, query_vector, results)
+        
+        return results
+    
+    @staticmethod
+    def _uses_vector(query: str, company_filter: Optional[str], filing_type_filter: Optional[str]) -> bool:
+        """Whether a query needs hybrid search; empty and unfiltered one-word queries don't."""
+        if not query:
+            return False
+        return len(query.split()) > 1 or bool(company_filter or filing_type_filter)
+    
+    def _run_search(
+        self,
+        query: str,
+        company_filter: Optional[str],
+        filing_type_filter: Optional[str],
+        limit: int,
+        properties: tuple,
+        query_vector: Optional[np.ndarray]
+    ) -> List[Dict]:
+        """Run the query against Weaviate and format the results."""
+        collection = self.weaviate.collection
+        
+        if company_filter:
+            logger.info(f"Applying Weaviate filter: companyName LIKE '*{company_filter}*'")
+        combined_filter = _build_filter(company_filter, filing_type_filter)
+        return_properties = list(properties)
+        
+        # No query text: there is nothing to score, so return filtered chunks unscored
+        if not query:
+            response = collection.query.fetch_objects(
+                filters=combined_filter,
+                limit=limit,
+                return_properties=return_properties,
+                include_vector=False
+            )
+            return [_format_result(obj, scored=False) for obj in response.objects]
+        
+        # A single word without filters is a keyword lookup; BM25 skips the vectorizer.
+        # BM25 scores are unbounded, not 0-1 relevance, so results are returned
+        # unscored and the hybrid score cutoff doesn't apply.
+        if not self._uses_vector(query, company_filter, filing_type_filter):
+            response = collection.query.bm25(
+                query=query,
+                limit=limit,
+                return_metadata=wvc.query.MetadataQuery(score=True),
+                return_properties=return_properties,
+                include_vector=False
+            )
+            return [_format_result(obj, scored=False) for obj in response.objects]
+        
+        # Perform hybrid search with alpha=0.75
+        # alpha=0.75 means 75% vector search (semantic), 25% BM25 (keyword)
+        response = collection.query.hybrid(
+            query=query,
+            vector=query_vector.tolist() if query_vector is not None else None,
+            alpha=0.75,
+            # Over-fetch so low-scoring results don't leave us short of `limit`
+            limit=max(limit * 3, 15),
+            return_metadata=wvc.query.MetadataQuery(score=True),
+            return_properties=return_properties,
+            include_vector=False,
+            filters=combined_filter
+        )
+        
+        # Keep the first `limit` results above the score threshold
+        results = []
+        for obj in response.objects:
+            if len(results) >= limit:
+                break
+            if obj.metadata.score > self.MIN_HYBRID_SCORE:
+                results.append(_format_result(obj))
+        
+        return results
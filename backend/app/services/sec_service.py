@@ -5,12 +5,107 @@ Handles API calls, rate limiting, and parsing of SEC data.
 import httpx
 import asyncio
 import logging
+import queue
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
-from datetime import datetime, date, timedelta
+from datetime import date, timedelta
+import lxml.html
+from lxml import etree
 from bs4 import BeautifulSoup
-from markitdown import MarkItDown
-import io
-from ..config import settings
+from markdownify import MarkdownConverter
+from ..config import get_settings
+
+settings = get_settings()
+
+# Inline style values that hide an element
+_HIDDEN_STYLE_RE = re.compile(r'display\s*:\s*none', re.IGNORECASE)
+
+# Tags holding the XBRL header, removed along with their contents
+_XBRL_HEADER_TAGS = {'ix:header', 'xbrl'}
+
+# Queued instead of the end-of-body marker (None) when a download fails
+_ABORT = object()
+
+# Filing types fetched from EDGAR
+VALID_FORMS = {"10-K", "10-Q", "8-K", "20-F", "S-1", "DEF 14A"}
+
+
+def _tree_to_soup(root: lxml.html.HtmlElement) -> BeautifulSoup:
+    """
+    Copy an lxml tree into a BeautifulSoup tree for markdownify.
+    
+    Building the soup node by node avoids serializing the tree and having
+    BeautifulSoup parse the HTML a second time. Comments are left out.
+    """
+    soup = BeautifulSoup("", "html.parser")
+    top = soup.new_tag(root.tag, attrs=dict(root.attrib))
+    soup.append(top)
+    
+    # Each element's children are added in order before any of them is
+    # filled in, so the stack order doesn't affect document order
+    pending = [(root, top)]
+    while pending:
+        element, tag = pending.pop()
+        if element.text:
+            tag.append(soup.new_string(element.text))
+        for child in element:
+            if isinstance(child.tag, str):
+                child_tag = soup.new_tag(child.tag, attrs=dict(child.attrib))
+                tag.append(child_tag)
+                pending.append((child, child_tag))
+            if child.tail:
+                tag.append(soup.new_string(child.tail))
+    
+    return soup
+
+
+class SECHTMLCleaner:
+    """
+    Incrementally parses SEC HTML and removes XBRL headers and hidden elements.
+    
+    Data can be fed as it arrives. Each element is classified when its end
+    tag is parsed; the removals are applied in close(), once the parser is
+    done with the tree.
+    """
+    
+    def __init__(self, encoding: Optional[str] = None):
+        self._parser = etree.HTMLPullParser(events=("end",), encoding=encoding)
+        self._parser.set_element_class_lookup(lxml.html.HtmlElementClassLookup())
+        self._drop = []
+        self._unwrap = []
+    
+    def _classify_events(self):
+        """Classify the elements closed since the last call."""
+        for _, element in self._parser.read_events():
+            tag = element.tag
+            # 1. Remove the entire XBRL header
+            # 2. Remove hidden elements
+            if tag in _XBRL_HEADER_TAGS or _HIDDEN_STYLE_RE.search(element.get('style', '')):
+                self._drop.append(element)
+            # 3. Unwrap 'Inline XBRL' tags (keep text, remove tag)
+            elif tag.startswith('ix:'):
+                self._unwrap.append(element)
+    
+    def feed(self, data):
+        """Parse the next piece of the document (str or bytes, not mixed)."""
+        self._parser.feed(data)
+        self._classify_events()
+    
+    def close(self) -> lxml.html.HtmlElement:
+        """Finish parsing, apply the removals and return the cleaned root element."""
+        root = self._parser.close()
+        self._classify_events()
+        
+        for element in self._unwrap:
+            if element.getparent() is not None:
+                element.drop_tag()
+        for element in self._drop:
+            if element.getparent() is not None:
+                element.drop_tree()
+        
+        return root
 
 
 class SECService:
@@ -26,7 +121,10 @@ class SECService:
     ]
     
     BASE_URL = "https://data.sec.gov"
-    RATE_LIMIT_DELAY = 0.1  # 10 requests per second max
+    RATE_LIMIT_PER_SECOND = 10  # SEC's fair access limit
+    MAX_CONCURRENT_REQUESTS = 10
+    # Bytes of a document handed to its parsing thread at a time
+    FEED_CHUNK_SIZE = 256 * 1024
     
     def __init__(self):
         """Initialize SEC service with proper headers."""
@@ -44,9 +142,59 @@ class SECService:
             "Host": "www.sec.gov"
         }
         
-        self.md_converter = MarkItDown()
+        # Shared clients so connections are pooled and reused across requests
+        self._api_client = httpx.AsyncClient(
+            base_url=self.BASE_URL,
+            headers=self.api_headers,
+            timeout=30.0,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=10)
+        )
+        self._doc_client = httpx.AsyncClient(
+            headers=self.doc_headers,
+            timeout=60.0,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=10)
+        )
+        
+        # Rate limiting: bounded concurrency plus a token bucket refilled
+        # at RATE_LIMIT_PER_SECOND. The bucket holds a single token, so
+        # requests are spaced evenly and no 1s window exceeds the limit.
+        self._semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)
+        self._tokens = 1.0
+        self._last_refill = time.monotonic()
+        self._token_lock = asyncio.Lock()
+        
+        # Each document is parsed, cleaned and converted on a single thread of
+        # this pool; an lxml parser must not move between threads mid-parse
+        self._parse_pool = ThreadPoolExecutor(
+            max_workers=self.MAX_CONCURRENT_REQUESTS,
+            thread_name_prefix="sec-parse"
+        )
+        
         self.logger = logging.getLogger(__name__)
     
+    async def aclose(self):
+        """Close the shared HTTP clients and the parsing pool."""
+        await self._api_client.aclose()
+        await self._doc_client.aclose()
+        self._parse_pool.shutdown(wait=False, cancel_futures=True)
+    
+    async def _acquire_token(self):
+        """Wait until a request may be sent without exceeding the SEC rate limit."""
+        async with self._token_lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    1.0,
+                    self._tokens + (now - self._last_refill) * self.RATE_LIMIT_PER_SECOND
+                )
+                self._last_refill = now
+                
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                
+                await asyncio.sleep((1 - self._tokens) / self.RATE_LIMIT_PER_SECOND)
+    
     def clean_sec_html(self, html_input: str) -> str:
         """
         Clean SEC HTML by removing XBRL headers and hidden elements.
@@ -57,25 +205,28 @@ class SECService:
         Returns:
             Cleaned HTML string
         """
-        soup = BeautifulSoup(html_input, 'html.parser')
-        
-        # 1. Remove the entire XBRL header
-        for header in soup.find_all(['ix:header', 'xbrl']):
-            header.decompose()
-        
-        # 2. Remove hidden elements
-        for hidden in soup.find_all(style=lambda value: value and 'display:none' in value.replace(' ', '')):
-            hidden.decompose()
-        
-        # 3. Unwrap 'Inline XBRL' tags (keep text, remove tag)
-        for ix_tag in soup.find_all(lambda tag: tag.name and tag.name.startswith('ix:')):
-            ix_tag.unwrap()
+        cleaner = SECHTMLCleaner()
+        cleaner.feed(html_input)
+        return etree.tostring(cleaner.close(), encoding="unicode", method="html")
+    
+    def convert_tree_to_markdown(self, root: lxml.html.HtmlElement) -> str:
+        """
+        Convert a cleaned HTML tree to markdown using markdownify.
         
-        return str(soup)
+        Args:
+            root: Root element returned by SECHTMLCleaner.close()
+            
+        Returns:
+            Markdown formatted text
+        """
+        # Only the body is content; the head would add the <title> text on top
+        body = root.find("body")
+        soup = _tree_to_soup(body if body is not None else root)
+        return MarkdownConverter(heading_style="ATX").convert_soup(soup)
     
     def convert_html_to_markdown(self, html_content: str) -> str:
         """
-        Convert cleaned HTML to markdown using MarkItDown.
+        Convert cleaned HTML to markdown using markdownify.
         
         Args:
             html_content: Raw HTML content
@@ -85,13 +236,9 @@ class SECService:
         """
         try:
             # Clean the HTML first
-            clean_html = self.clean_sec_html(html_content)
-            
-            # Convert to markdown
-            clean_html_stream = io.BytesIO(clean_html.encode("utf-8"))
-            result = self.md_converter.convert_stream(clean_html_stream, file_extension=".html")
-            
-            return result.markdown
+            cleaner = SECHTMLCleaner()
+            cleaner.feed(html_content)
+            return self.convert_tree_to_markdown(cleaner.close())
         except Exception as e:
             self.logger.error(f"Error converting HTML to markdown: {e}")
             # Fallback: return cleaned HTML if markdown conversion fails
@@ -115,75 +262,71 @@ class SECService:
         # Ensure CIK is 10 digits with leading zeros
         cik = cik.zfill(10)
         
-        url = f"{self.BASE_URL}/submissions/CIK{cik}.json"
+        url = f"/submissions/CIK{cik}.json"
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            try:
-                # Rate limiting
-                await asyncio.sleep(self.RATE_LIMIT_DELAY)
-                
-                response = await client.get(url, headers=self.api_headers)
-                response.raise_for_status()
-                data = response.json()
-                
-                # Extract company info and recent filings
-                company_name = data.get("name", "Unknown Company")
-                filings = data.get("filings", {}).get("recent", {})
-                
-                # Parse filings
-                result = []
-                accession_numbers = filings.get("accessionNumber", [])
-                filing_dates = filings.get("filingDate", [])
-                forms = filings.get("form", [])
-                primary_documents = filings.get("primaryDocument", [])
-                descriptions = filings.get("primaryDocDescription", [])
+        try:
+            async with self._semaphore:
+                await self._acquire_token()
+                response = await self._api_client.get(url)
+            response.raise_for_status()
+            data = response.json()
+            
+            # Extract company info and recent filings
+            company_name = data.get("name", "Unknown Company")
+            filings = data.get("filings", {}).get("recent", {})
+            
+            # Parse filings
+            result = []
+            accession_numbers = filings.get("accessionNumber", [])
+            filing_dates = filings.get("filingDate", [])
+            forms = filings.get("form", [])
+            primary_documents = filings.get("primaryDocument", [])
+            descriptions = filings.get("primaryDocDescription", [])
+            
+            # Skip filings from the future or very recent (last 30 days)
+            # Recent filings might not have HTML available yet.
+            # ISO dates compare correctly as strings, so no parsing is needed to filter.
+            cutoff = (date.today() - timedelta(days=30)).isoformat()
+            
+            # Filter for common filing types and dates before the cutoff
+            candidates = [
+                i for i, form in enumerate(forms)
+                if form in VALID_FORMS and filing_dates[i] < cutoff
+            ]
+            
+            # Combine data from parallel arrays
+            for i in candidates:
+                form = forms[i]
+                filing_date_obj = date.fromisoformat(filing_dates[i])
                 
-                # Combine data from parallel arrays
-                today = date.today()
+                accession = accession_numbers[i].replace("-", "")
+                primary_doc = primary_documents[i]
                 
-                for i in range(len(accession_numbers)):
-                    # Filter for common filing types
-                    form = forms[i]
-                    if form not in ["10-K", "10-Q", "8-K", "20-F", "S-1", "DEF 14A"]:
-                        continue
-                    
-                    # Parse filing date and skip future filings
-                    filing_date = filing_dates[i]
-                    filing_date_obj = datetime.strptime(filing_date, "%Y-%m-%d").date()
-                    
-                    # Skip filings from the future or very recent (last 30 days)
-                    # Recent filings might not have HTML available yet
-                    if filing_date_obj >= (today - timedelta(days=30)):
-                        continue
-                    
-                    accession = accession_numbers[i].replace("-", "")
-                    primary_doc = primary_documents[i]
-                    
-                    # Construct document URL
-                    doc_url = (
-                        f"https://www.sec.gov/Archives/edgar/data/{cik.lstrip('0')}/"
-                        f"{accession}/{primary_doc}"
-                    )
-                    
-                    result.append({
-                        "accession_number": accession_numbers[i],
-                        "company_name": company_name,
-                        "company_cik": cik,
-                        "filing_type": form,
-                        "filing_date": filing_date_obj,
-                        "description": descriptions[i] if i < len(descriptions) else form,
-                        "document_url": doc_url
-                    })
-                    
-                    # Stop once we have enough valid filings
-                    if len(result) >= max_filings:
-                        break
+                # Construct document URL
+                doc_url = (
+                    f"https://www.sec.gov/Archives/edgar/data/{cik.lstrip('0')}/"
+                    f"{accession}/{primary_doc}"
+                )
                 
-                return result
+                result.append({
+                    "accession_number": accession_numbers[i],
+                    "company_name": company_name,
+                    "company_cik": cik,
+                    "filing_type": form,
+                    "filing_date": filing_date_obj,
+                    "description": descriptions[i] if i < len(descriptions) else form,
+                    "document_url": doc_url
+                })
                 
-            except httpx.HTTPError as e:
-                self.logger.error(f"Error fetching SEC data for CIK {cik}: {e}")
-                return []
+                # Stop once we have enough valid filings
+                if len(result) >= max_filings:
+                    break
+            
+            return result
+            
+        except httpx.HTTPError as e:
+            self.logger.error(f"Error fetching SEC data for CIK {cik}: {e}")
+            return []
     
     async def fetch_document_text(self, document_url: str) -> Optional[str]:
         """
@@ -195,23 +338,70 @@ class SECService:
         Returns:
             Markdown formatted content or None if failed
         """
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            try:
-                # Rate limiting
-                await asyncio.sleep(self.RATE_LIMIT_DELAY)
-                
-                response = await client.get(document_url, headers=self.doc_headers)
-                response.raise_for_status()
-                
-                # Convert HTML to markdown
-                if response.text:
-                    markdown_content = self.convert_html_to_markdown(response.text)
-                    return markdown_content
-                return None
-                
-            except Exception as e:
-                self.logger.error(f"Error fetching document text from {document_url}: {e}")
+        try:
+            # Parse and clean the HTML as it downloads instead of buffering the body
+            async with self._semaphore:
+                await self._acquire_token()
+                async with self._doc_client.stream("GET", document_url) as response:
+                    response.raise_for_status()
+                    
+                    # Without a declared charset libxml2 would assume Latin-1;
+                    # decode as UTF-8 like httpx's response.text does
+                    encoding = response.charset_encoding or "utf-8"
+                    
+                    # Parsing is CPU work, so one pool thread parses and converts
+                    # the document while the event loop hands it the body
+                    pieces = queue.SimpleQueue()
+                    parsed = asyncio.get_running_loop().run_in_executor(
+                        self._parse_pool, self._parse_document, pieces, encoding
+                    )
+                    completed = False
+                    try:
+                        async for data in response.aiter_bytes(chunk_size=self.FEED_CHUNK_SIZE):
+                            pieces.put(data)
+                        completed = True
+                    finally:
+                        pieces.put(None if completed else _ABORT)
+            
+            return await parsed
+            
+        except Exception as e:
+            self.logger.error(f"Error fetching document text from {document_url}: {e}")
+            return None
+    
+    def _parse_document(self, pieces: queue.SimpleQueue, encoding: str) -> Optional[str]:
+        """
+        Parse, clean and convert one document entirely on the calling thread.
+        
+        Args:
+            pieces: Body pieces, ended by None (or _ABORT if the download failed)
+            encoding: Character encoding of the body
+            
+        Returns:
+            Markdown formatted content, or None if the body was empty or incomplete
+        """
+        cleaner = SECHTMLCleaner(encoding=encoding)
+        received = False
+        while (data := pieces.get()) is not None:
+            if data is _ABORT:
                 return None
+            cleaner.feed(data)
+            received = True
+        
+        if not received:
+            return None
+        
+        return self._finish_document(cleaner)
+    
+    def _finish_document(self, cleaner: SECHTMLCleaner) -> str:
+        """Apply the cleaner's removals and convert the cleaned tree to markdown."""
+        root = cleaner.close()
+        try:
+            return self.convert_tree_to_markdown(root)
+        except Exception as e:
+            self.logger.error(f"Error converting HTML to markdown: {e}")
+            # Fallback: return cleaned HTML if markdown conversion fails
+            return etree.tostring(root, encoding="unicode", method="html")
     
     async def sync_companies(
         self,
@@ -233,25 +423,25 @@ class SECService:
         if ciks is None:
             ciks = self.DEFAULT_CIKS
         
-        all_filings = []
+        # Fetch every company's filing list concurrently, within the rate limit
+        self.logger.info(f"Fetching filings for CIKs: {', '.join(ciks)}")
+        results = await asyncio.gather(
+            *[self.fetch_company_filings(cik, max_filings_per_company) for cik in ciks]
+        )
+        all_filings = [filing for filings in results for filing in filings]
         
-        for cik in ciks:
-            self.logger.info(f"Fetching filings for CIK: {cik}")
-            filings = await self.fetch_company_filings(cik, max_filings_per_company)
+        # Optionally fetch and convert to markdown for each filing, concurrently
+        if fetch_markdown:
+            self.logger.info(f"Fetching and converting {len(all_filings)} filings to markdown")
+            contents = await asyncio.gather(
+                *[self.fetch_document_text(filing["document_url"]) for filing in all_filings]
+            )
             
-            # Optionally fetch and convert to markdown for each filing
-            if fetch_markdown:
-                for filing in filings:
-                    self.logger.info(f"  Fetching and converting to markdown: {filing['filing_type']} - {filing['accession_number']}")
-                    markdown_content = await self.fetch_document_text(filing["document_url"])
-                    if markdown_content:
-                        filing["markdown_content"] = markdown_content
-                        self.logger.info(f"    ✓ Successfully converted to markdown ({len(markdown_content)} chars)")
-                    else:
-                        filing["markdown_content"] = None
-                        self.logger.warning(f"    ✗ Failed to fetch/convert (will store metadata only)")
-            
-            all_filings.extend(filings)
+            for filing, markdown_content in zip(all_filings, contents):
+                filing["markdown_content"] = markdown_content
+                if markdown_content:
+                    self.logger.info(f"  ✓ {filing['filing_type']} - {filing['accession_number']}: converted to markdown ({len(markdown_content)} chars)")
+                else:
+                    self.logger.warning(f"  ✗ {filing['filing_type']} - {filing['accession_number']}: failed to fetch/convert (will store metadata only)")
         
         return all_filings
-
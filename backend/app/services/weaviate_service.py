@@ -3,14 +3,51 @@ Weaviate service for vector database operations.
 Handles chunk storage and schema management.
 """
 import logging
+import re
+import time
 import weaviate
 from weaviate.classes.config import Configure, Property, DataType, Tokenization
 from weaviate.classes.query import Filter
-from typing import List, Dict, Optional
+from weaviate.util import generate_uuid5
+from typing import List, Dict, Optional, Set, Tuple
 from datetime import datetime, timezone
-from ..config import settings
+from ..config import get_settings
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_MIDNIGHT = datetime.min.time()
+
+# Alphabetic words, as the WORD tokenizer would index them
+_WORD_RE = re.compile(r"[A-Za-z]+")
+
+
+def _to_datetime(value):
+    """Convert a date to a datetime at midnight, leaving datetimes and None as-is."""
+    if value and not isinstance(value, datetime):
+        return datetime.combine(value, _MIDNIGHT)
+    return value
+
+
+def _build_properties(chunk: Dict, now: datetime) -> Dict:
+    """Map a chunk dictionary to DocumentChunk object properties."""
+    content = chunk.get("content", "")
+    metadata = chunk.get("metadata", {})
+    
+    return {
+        "documentId": chunk.get("document_id"),
+        "accessionNumber": chunk.get("accession_number"),
+        "chunkIndex": chunk.get("chunk_index"),
+        "content": content,
+        "companyName": chunk.get("company_name"),
+        "filingType": chunk.get("filing_type"),
+        "filingDate": _to_datetime(chunk.get("filing_date")),
+        "documentUrl": chunk.get("document_url"),
+        "createdAt": _to_datetime(chunk.get("created_at")) or now,
+        "chunkCharCount": len(content),
+        "totalChunks": metadata.get("total_chunks", 0),
+        "chunkPosition": metadata.get("chunk_position", 0.0),
+    }
 
 
 class WeaviateService:
@@ -18,9 +55,18 @@ class WeaviateService:
     
     COLLECTION_NAME = "DocumentChunk"
     
+    # How long an is_ready() result is trusted before asking Weaviate again
+    READY_CHECK_TTL = 5.0
+    
     def __init__(self):
         """Initialize Weaviate client."""
         self.client = None
+        self._collection = None
+        self._ready = False
+        self._ready_checked_at = None
+        # Bumped whenever chunks are added or deleted so search caches can
+        # tell their results are stale
+        self.data_version = 0
         self._connect()
     
     def _connect(self):
@@ -46,16 +92,62 @@ class WeaviateService:
                 )
             
             logger.info(f"Connected to Weaviate: {self.client.is_ready()}")
+            
+            if self.client.collections.exists(self.COLLECTION_NAME):
+                self._collection = self.client.collections.get(self.COLLECTION_NAME)
+                self.warmup()
         except Exception as e:
             logger.error(f"Failed to connect to Weaviate: {e}")
             self.client = None
+            self._collection = None
+    
+    @property
+    def collection(self):
+        """Handle to the DocumentChunk collection, looked up once and reused."""
+        if self._collection is None:
+            self._collection = self.client.collections.get(self.COLLECTION_NAME)
+        return self._collection
+    
+    def warmup(self):
+        """
+        Run one cheap object fetch and one BM25 query so the first real
+        search doesn't pay for loading the vector and inverted indexes.
+        """
+        try:
+            response = self.collection.query.fetch_objects(
+                limit=1,
+                include_vector=False,
+                return_properties=["content"]
+            )
+            if not response.objects:
+                return
+            
+            # Query a term that is actually indexed: a fixed word like "the" is
+            # a stopword and would be stripped before touching the index.
+            # The chunk's longest word is very unlikely to be a stopword.
+            words = _WORD_RE.findall(response.objects[0].properties.get("content", ""))
+            term = max(words, key=len, default="")
+            if term:
+                self.collection.query.bm25(query=term, limit=1)
+            logger.info(f"Warmed up collection {self.COLLECTION_NAME}")
+        except Exception as e:
+            logger.warning(f"Weaviate warmup failed: {e}")
     
     def is_connected(self) -> bool:
-        """Check if Weaviate is connected."""
+        """Check if Weaviate is connected, reusing the last answer for READY_CHECK_TTL seconds."""
+        if self.client is None:
+            return False
+        
+        now = time.monotonic()
+        if self._ready_checked_at is not None and now - self._ready_checked_at < self.READY_CHECK_TTL:
+            return self._ready
+        
         try:
-            return self.client is not None and self.client.is_ready()
+            self._ready = self.client.is_ready()
         except:
-            return False
+            self._ready = False
+        self._ready_checked_at = now
+        return self._ready
     
     def create_schema(self):
         """
@@ -68,6 +160,7 @@ class WeaviateService:
             # Check if collection exists
             if self.client.collections.exists(self.COLLECTION_NAME):
                 logger.info(f"Collection {self.COLLECTION_NAME} already exists")
+                self._collection = self.client.collections.get(self.COLLECTION_NAME)
                 return
             
             # Create collection with Google AI Studio (Gemini) vectorizer
@@ -148,69 +241,65 @@ class WeaviateService:
                     ),
                 ]
             )
+            self._collection = self.client.collections.get(self.COLLECTION_NAME)
             logger.info(f"Created collection {self.COLLECTION_NAME}")
             
         except Exception as e:
             logger.error(f"Error creating schema: {e}")
             raise
     
-    def add_chunks(self, chunks: List[Dict]) -> int:
+    def add_chunks(self, chunks: List[Dict]) -> Tuple[int, Set[str]]:
         """
         Add document chunks to Weaviate.
         
+        Each chunk gets a deterministic ID from its accession number and chunk
+        index, so storing the same chunk again overwrites it instead of
+        creating a duplicate.
+        
         Args:
             chunks: List of chunk dictionaries
             
         Returns:
-            Number of chunks successfully added
+            Number of chunks successfully added, and the IDs of documents
+            with at least one chunk that failed to store
         """
         if not self.client:
             raise Exception("Weaviate client not connected")
         
         if not chunks:
-            return 0
+            return 0, set()
         
         try:
-            collection = self.client.collections.get(self.COLLECTION_NAME)
+            collection = self.collection
+            now = datetime.now(timezone.utc)
+            
+            # Build every object's properties up front so the batch loop only sends
+            properties_list = [_build_properties(chunk, now) for chunk in chunks]
             
-            # Prepare data objects
-            with collection.batch.dynamic() as batch:
-                for chunk in chunks:
-                    # Convert filing_date to datetime if it's a date object
-                    filing_date = chunk.get("filing_date")
-                    if filing_date and not isinstance(filing_date, datetime):
-                        filing_date = datetime.combine(filing_date, datetime.min.time())
-                    
-                    # Convert created_at to datetime if it's a date object
-                    created_at = chunk.get("created_at")
-                    if created_at and not isinstance(created_at, datetime):
-                        created_at = datetime.combine(created_at, datetime.min.time())
-                    
-                    # Get metadata
-                    metadata = chunk.get("metadata", {})
-                    
-                    properties = {
-                        "documentId": chunk.get("document_id"),
-                        "accessionNumber": chunk.get("accession_number"),
-                        "chunkIndex": chunk.get("chunk_index"),
-                        "content": chunk.get("content"),
-                        "companyName": chunk.get("company_name"),
-                        "filingType": chunk.get("filing_type"),
-                        "filingDate": filing_date,
-                        "documentUrl": chunk.get("document_url"),
-                        "createdAt": created_at or datetime.now(timezone.utc),
-                        "chunkCharCount": len(chunk.get("content", "")),
-                        "totalChunks": metadata.get("total_chunks", 0),
-                        "chunkPosition": metadata.get("chunk_position", 0.0),
-                    }
-                    
-                    batch.add_object(properties=properties)
+            # Send 100 objects per request with 4 requests in flight
+            with collection.batch.fixed_size(batch_size=100, concurrent_requests=4) as batch:
+                for properties in properties_list:
+                    batch.add_object(
+                        properties=properties,
+                        uuid=generate_uuid5(f"{properties['accessionNumber']}:{properties['chunkIndex']}")
+                    )
+            self.data_version += 1
+            
+            failed_objects = collection.batch.failed_objects
+            if failed_objects:
+                logger.error(
+                    f"Failed to add {len(failed_objects)} of {len(chunks)} chunks to Weaviate, "
+                    f"first error: {failed_objects[0].message}"
+                )
             
-            return len(chunks)
+            failed_document_ids = {
+                failed.object_.properties["documentId"] for failed in failed_objects
+            }
+            return len(chunks) - len(failed_objects), failed_document_ids
             
         except Exception as e:
             logger.error(f"Error adding chunks to Weaviate: {e}")
-            return 0
+            return 0, {chunk.get("document_id") for chunk in chunks}
     
     def get_chunk_count(self, document_id: str) -> int:
         """
@@ -226,9 +315,7 @@ class WeaviateService:
             return 0
         
         try:
-            collection = self.client.collections.get(self.COLLECTION_NAME)
-            
-            response = collection.aggregate.over_all(
+            response = self.collection.aggregate.over_all(
                 filters=Filter.by_property("documentId").equal(document_id)
             )
             
@@ -252,11 +339,10 @@ class WeaviateService:
             return 0
         
         try:
-            collection = self.client.collections.get(self.COLLECTION_NAME)
-            
-            result = collection.data.delete_many(
+            result = self.collection.data.delete_many(
                 where=Filter.by_property("documentId").equal(document_id)
             )
+            self.data_version += 1
             
             return result.successful if result else 0
             
@@ -11,6 +11,8 @@ import LoadingSpinner from './LoadingSpinner';
 import { useDocuments } from '../hooks/useDocuments';
 import { documentAPI } from '../services/api';
 
+const SYNC_POLL_INTERVAL_MS = 2000;
+
 const DocumentList = () => {
   const [syncing, setSyncing] = useState(false);
   const [syncMessage, setSyncMessage] = useState('');
@@ -55,10 +57,21 @@ const DocumentList = () => {
         max_filings_per_company: 5,
       });
       
+      // Poll the background job until it finishes
+      let job = response.data;
+      while (job.status === 'queued' || job.status === 'running') {
+        await new Promise((resolve) => setTimeout(resolve, SYNC_POLL_INTERVAL_MS));
+        job = (await documentAPI.getSyncJob(job.job_id)).data;
+      }
+      
+      if (job.status === 'failed') {
+        throw new Error(job.error);
+      }
+      
       setSyncMessage(
-        `Success! Created ${response.data.documents_created} documents, ` +
-        `updated ${response.data.documents_updated}, ` +
-        `and generated ${response.data.chunks_created} chunks.`
+        `Success! Created ${job.result.documents_created} documents, ` +
+        `updated ${job.result.documents_updated}, ` +
+        `and generated ${job.result.chunks_created} chunks.`
       );
       
       // Refresh the document list
@@ -66,7 +79,7 @@ const DocumentList = () => {
         refetch();
       }, 1000);
     } catch (error) {
-      setSyncMessage(`Error: ${error.response?.data?.detail || 'Failed to sync documents'}`);
+      setSyncMessage(`Error: ${error.response?.data?.detail || error.message || 'Failed to sync documents'}`);
     } finally {
       setSyncing(false);
     }
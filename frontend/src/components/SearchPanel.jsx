@@ -226,10 +226,14 @@ const SearchPanel = () => {
                           <span className="font-medium">{chunk.metadata.filing_type}</span>
                           <span>•</span>
                           <span>{formatDate(chunk.metadata.filing_date)}</span>
-                          <span>•</span>
-                          <span className="text-xs bg-gray-100 px-2 py-0.5 rounded">
-                            Relevance: {(chunk.score * 100).toFixed(1)}%
-                          </span>
+                          {chunk.score != null && (
+                            <>
+                              <span>•</span>
+                              <span className="text-xs bg-gray-100 px-2 py-0.5 rounded">
+                                Relevance: {(chunk.score * 100).toFixed(1)}%
+                              </span>
+                            </>
+                          )}
                         </div>
                       </div>
                       {chunk.metadata.document_url && (
@@ -13,6 +13,7 @@ export const useDocuments = (initialFilters = {}) => {
   const [filters, setFilters] = useState({
     skip: 0,
     limit: 20,
+    include_total: true,
     ...initialFilters,
   });
 
@@ -34,7 +35,7 @@ export const useDocuments = (initialFilters = {}) => {
       try {
         const response = await documentAPI.listDocuments(filters);
         setDocuments(response.data.items);
-        setTotal(response.data.total);
+        setTotal(response.data.total ?? 0);
       } catch (err) {
         setError(err.response?.data?.detail || 'Failed to fetch documents');
         console.error('Error fetching documents:', err);
@@ -58,6 +59,7 @@ export const useDocuments = (initialFilters = {}) => {
     setFilters({
       skip: 0,
       limit: 20,
+      include_total: true,
     });
   }, []);
 
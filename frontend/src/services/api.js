@@ -50,11 +50,16 @@ export const documentAPI = {
     return api.get(`/api/documents/${id}/chunks/status`);
   },
 
-  // Sync documents from SEC
+  // Start a background sync of documents from SEC
   syncDocuments: (data = {}) => {
     return api.post('/api/documents/sync', data);
   },
 
+  // Get the status of a background sync job
+  getSyncJob: (jobId) => {
+    return api.get(`/api/documents/sync/${jobId}`);
+  },
+
   // Get filing types
   getFilingTypes: () => {
     return api.get('/api/filing-types');